@@ -3,25 +3,134 @@ API Module
 
 This module implements FastAPI endpoints for handling external integrations, primarily:
 - Payment processing webhooks
+- Telegram update webhooks
 - Subscription management
 - User notifications
+- The process metrics (/metrics)
 
 The API provides secure endpoints with HMAC signature verification for payment processing
-and subscription management.
+and subscription management. Notifications are acknowledged as soon as they are recorded,
+and a background worker pool applies completed payments idempotently by txn_id.
+
+In webhook mode the app is served from the bot process (see bot.instance), so Telegram
+updates and payment notifications share one event loop and one database pool.
 """
 
+import asyncio
+import hmac 
+import hashlib
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Header, Request, HTTPException
+from fastapi.responses import PlainTextResponse
 from typing import Optional
-from config import Config
+from sqlalchemy.exc import IntegrityError
+from telebot import types
+from config import Config, bot
 from database import MySQL
-from datetime import datetime, timedelta
-import hmac 
-import hashlib
-from utils.user import GetUser
-from telebot.util import quick_markup
-from classes.GroupManager import GroupManager as GM
+from utils.utils import utcnow
+from classes.PaymentQueue import payment_queue
+from classes.Metrics import metrics, is_authorized, CONTENT_TYPE
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Run the payment workers for the lifetime of the app.
+
+    Completed payments that were recorded but never applied or notified (e.g. because
+    the process stopped with a non-empty queue, or sending the invite link failed)
+    are queued again by the sweep.
+    """
+    payment_queue.start()
+    sweeper = asyncio.create_task(payment_queue.sweep(Config["ipn_sweep_interval"]))
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        await payment_queue.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+api_request_duration = metrics.histogram(
+    "api_request_duration_seconds", "Duration of the API requests (payment notifications, webhook updates)",
+    labels=("path", "status")
+)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Time every request, labelled by route so unknown paths don't add label values."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    api_request_duration.observe(
+        time.perf_counter() - started,
+        path=route.path if route is not None else "unmatched",
+        status=response.status_code
+    )
+    return response
+
+@app.get("/metrics")
+async def metrics_endpoint(authorization: Optional[str] = Header(None)):
+    """
+    Metrics endpoint.
+
+    Serves the metrics of this process (handler latencies, database and Telegram calls,
+    members checker cycles, payment processing) in the Prometheus text format.
+
+    Args:
+        authorization (str, optional): "Bearer <token>", required when Config["METRICS_TOKEN"] is set
+
+    Returns:
+        PlainTextResponse: The metrics
+
+    Raises:
+        HTTPException: If the token is missing or invalid
+    """
+    if not is_authorized(authorization, Config["METRICS_TOKEN"]):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
 
-app = FastAPI()
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+# Tasks processing webhook updates, referenced until they are done
+update_tasks = set()
+
+@app.post(Config["webhook_path"])
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    """
+    Telegram update webhook endpoint.
+
+    This endpoint receives the updates pushed by Telegram in webhook mode. It checks
+    the secret token set with setWebhook, then hands the update to the bot's
+    middlewares and handlers in the background and answers right away, like polling does.
+
+    Args:
+        request (Request): The incoming update request
+        x_telegram_bot_api_secret_token (str, optional): Secret token sent by Telegram
+
+    Returns:
+        dict: Status response
+
+    Raises:
+        HTTPException: If the secret token is missing or invalid, or webhook mode is disabled
+    """
+    secret = Config["WEBHOOK_SECRET"]
+    if (
+        Config["UPDATE_MODE"] != "webhook"
+        or not secret
+        or not x_telegram_bot_api_secret_token
+        or not hmac.compare_digest(x_telegram_bot_api_secret_token, secret)
+    ):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    update = types.Update.de_json(await request.json())
+    task = asyncio.create_task(bot.process_new_updates([update]))
+    update_tasks.add(task)
+    task.add_done_callback(update_tasks.discard)
+
+    return {"status": "ok"}
 
 @app.post("/payment_handler")
 async def ipn_handler(
@@ -32,8 +141,9 @@ async def ipn_handler(
     Payment notification handler endpoint.
 
     This endpoint processes Instant Payment Notifications (IPN) from the payment provider.
-    It verifies the payment signature, updates user subscription status, and sends
-    notifications to users.
+    It verifies the payment signature, records the transaction status by txn_id and
+    acknowledges the notification. Completed payments are queued, and the payment
+    workers grant the subscription and notify the user once per txn_id.
 
     Args:
         request (Request): The incoming webhook request
@@ -43,7 +153,7 @@ async def ipn_handler(
         dict: Status response
 
     Raises:
-        HTTPException: If HMAC header is missing or invalid
+        HTTPException: If HMAC header is missing or invalid, or the paid transaction is unknown
     """
     if not HMAC:
         raise HTTPException(status_code=400, detail="Missing HMAC header")
@@ -65,34 +175,39 @@ async def ipn_handler(
     ipn_data = {key: value for key, value in form_data.items()}
 
     status = int(ipn_data.get("status", 0))
-    buyer_email = ipn_data.get("email")
+    txn_id = ipn_data.get("txn_id")
+    if not txn_id:
+        raise HTTPException(status_code=400, detail="Missing txn_id")
+
+    # Record the new status of the transaction
+    payment_known = await MySQL.UpdatePaymentStatus(txn_id, status)
 
-    # Handle successful payment
+    # Queue successful payments, the subscription is granted in the background
     if status >= 100:
-        GroupManager = GM()
-        user_data = await MySQL.GetUserByField("email", buyer_email)
-        User = await GetUser(user_data.user_id)
-
-        # Calculate subscription expiration
-        current_date = datetime.now()
-        expiration_date = current_date + timedelta(days=Config["subscription_days"])
-
-        # Update user subscription data
-        await MySQL.UpdateFieldForUser(user_data.user_id, "subscription_data", {
-            'expiration_date': expiration_date.timestamp()
-        })
-
-        # Generate group invite link and send to user
-        invite_link = await GroupManager.CreateInviteLink(user_data.user_id)
-        markup = quick_markup({
-            User.locales['joinGroup']: {'url': invite_link},
-        }, row_width=1)
-
-        # Send confirmation message to user
-        await User.SendMessage(
-            User.locales['subscription:started'].format(days=Config["subscription_days"]),
-            reply_markup=markup,
-            protect_content=True
-        )
+        if not payment_known:
+            # Transactions created before payments were recorded only match by email
+            user_data = await MySQL.GetUserByField("email", ipn_data.get("email"))
+            if not user_data:
+                raise HTTPException(status_code=404, detail="Unknown transaction")
+
+            now = utcnow()
+            try:
+                await MySQL.CreatePayment(
+                    txn_id,
+                    user_data.user_id,
+                    coin=ipn_data.get("currency2", ""),
+                    amount=ipn_data.get("amount2", ""),
+                    address=None,
+                    qrcode_url=None,
+                    status_url=None,
+                    deadline=now,
+                    created_at=now,
+                    status=status
+                )
+            except IntegrityError:
+                # A concurrent delivery of the same notification recorded it first
+                pass
+
+        payment_queue.submit(txn_id)
 
     return {"status": "ok"}
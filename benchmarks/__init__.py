@@ -0,0 +1,11 @@
+"""
+Benchmarks Package
+
+This package holds the scaling and load benchmarks of the bot including:
+- A local fake Telegram Bot API
+- Database seeding and measurement helpers
+- The members checker benchmark
+
+The benchmarks run against a local database and the fake Bot API, never against
+Telegram or the production database.
+"""
@@ -0,0 +1,173 @@
+"""
+Fake Bot API Module
+
+This module provides a local stand-in for the Telegram Bot API including:
+- An aiohttp server answering the Bot API methods used by the bot
+- The CoinPayments commands used by the buy flow, on the same server
+- A configurable response latency
+- Per-method call counters
+
+The bot's HTTP clients are pointed at the server, so the benchmarks go through the real
+request path (RequestScheduler, rate limits, aiohttp) without reaching Telegram or CoinPayments.
+"""
+
+import asyncio
+import time
+import urllib.parse
+from collections import Counter
+
+from aiohttp import web
+from telebot import asyncio_helper
+
+class FakeBotAPI:
+    """
+    A local HTTP server imitating the Telegram Bot API.
+
+    Attributes:
+        latency (float): Number of seconds every call takes
+        members (set): User IDs answered as members of the group by getChatMember
+        admins (list): User IDs returned by getChatAdministrators
+        calls (Counter): Number of calls of each method
+        port (int): The port the server listens on, set by start()
+    """
+
+    def __init__(self, latency: float = 0.0, members: set = None, admins: list = None):
+        """
+        Initialize the server, it is started by start().
+
+        Args:
+            latency (float, optional): Number of seconds every call takes. Defaults to 0
+            members (set, optional): User IDs that are members of the group. Defaults to none
+            admins (list, optional): User IDs of the group administrators. Defaults to none
+        """
+        self.latency = latency
+        self.members = members if members is not None else set()
+        self.admins = admins or []
+        self.calls = Counter()
+        self.port = None
+        self._runner = None
+        self._message_id = 0
+        self._txn_id = 0
+        self._previous_api_url = None
+        self._previous_coinpayments_url = None
+
+    def _user(self, user_id) -> dict:
+        user_id = int(user_id)
+        return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}", "username": f"user{user_id}"}
+
+    def _chat(self, chat_id) -> dict:
+        chat_id = int(chat_id)
+        return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}
+
+    def _message(self, params: dict) -> dict:
+        self._message_id += 1
+        return {
+            "message_id": int(params.get("message_id", self._message_id)),
+            "date": int(time.time()),
+            "chat": self._chat(params.get("chat_id", 1)),
+            "text": params.get("text", ""),
+        }
+
+    def _result(self, method: str, params: dict):
+        """Build the result of a Bot API method."""
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+        if method == "getChatMember":
+            user_id = int(params["user_id"])
+            status = "member" if user_id in self.members else "left"
+            return {"user": self._user(user_id), "status": status}
+        if method == "getChatAdministrators":
+            return [
+                {"user": self._user(user_id), "status": "administrator", "can_be_edited": False,
+                 "is_anonymous": False, "can_manage_chat": True, "can_delete_messages": True,
+                 "can_manage_video_chats": True, "can_restrict_members": True,
+                 "can_promote_members": False, "can_change_info": True, "can_invite_users": True,
+                 "can_post_stories": False, "can_edit_stories": False, "can_delete_stories": False}
+                for user_id in self.admins
+            ]
+        if method == "banChatMember":
+            self.members.discard(int(params["user_id"]))
+            return True
+        if method == "createChatInviteLink":
+            return {"invite_link": f"https://t.me/+fake{int(time.time() * 1000)}",
+                    "creator": self._user(1), "creates_join_request": False,
+                    "is_primary": False, "is_revoked": False, "member_limit": 1}
+        if method in ("sendMessage", "sendPhoto", "editMessageText", "editMessageCaption"):
+            return self._message(params)
+        return True
+
+    def _coinpayments_result(self, cmd: str, params: dict):
+        """Build the result of a CoinPayments command."""
+        if cmd == "create_transaction":
+            self._txn_id += 1
+            txn_id = f"FAKE{self._txn_id:012d}"
+            return {
+                "txn_id": txn_id, "amount": "0.00021", "address": f"fake-address-{txn_id}",
+                "confirms_needed": "2", "timeout": 3600,
+                "status_url": f"https://example.com/status/{txn_id}",
+                "qrcode_url": f"https://example.com/qrcode/{txn_id}.png",
+            }
+        if cmd == "rates":
+            return {"USD": {"rate_btc": "0.00001"}, "BTC": {"rate_btc": "1"}}
+        return {}
+
+    async def _request_params(self, request: web.Request) -> dict:
+        body = await request.read()
+        params = dict(urllib.parse.parse_qsl(body.decode())) if body else {}
+        params.update(request.query)
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params = await self._request_params(request)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    async def _handle_coinpayments(self, request: web.Request) -> web.Response:
+        params = await self._request_params(request)
+        cmd = params.get("cmd", "")
+        self.calls[f"coinpayments:{cmd}"] += 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response({"error": "ok", "result": self._coinpayments_result(cmd, params)})
+
+    async def start(self) -> None:
+        """Start the server on a free local port and point the bot's HTTP clients at it."""
+        from classes import CoinPayments
+
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._handle)
+        app.router.add_post("/coinpayments", self._handle_coinpayments)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+        self._previous_api_url = asyncio_helper.API_URL
+        asyncio_helper.API_URL = f"http://127.0.0.1:{self.port}/bot{{0}}/{{1}}"
+        self._previous_coinpayments_url = CoinPayments.API_URL
+        CoinPayments.API_URL = f"http://127.0.0.1:{self.port}/coinpayments"
+
+    async def stop(self) -> None:
+        """Stop the server and restore the bot's API URLs."""
+        from classes import CoinPayments
+
+        if self._previous_api_url is not None:
+            asyncio_helper.API_URL = self._previous_api_url
+        if self._previous_coinpayments_url is not None:
+            CoinPayments.API_URL = self._previous_coinpayments_url
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+        session = asyncio_helper.session_manager.session
+        if session is not None and not session.closed:
+            await session.close()
+
+    def total_calls(self) -> int:
+        """Get the total number of calls of every method."""
+        return sum(self.calls.values())
@@ -0,0 +1,260 @@
+"""
+Benchmark Harness Module
+
+This module provides the helpers shared by the benchmarks including:
+- Pointing the bot's config at a local database before it is imported
+- Seeding synthetic users and subscriptions
+- Counting the database queries
+- Measuring event loop lag and memory usage
+- Writing the results as JSON
+
+The bot's modules read the config when they are imported, so configure() must be
+called before importing anything from the bot, and the other helpers import the
+bot's modules lazily.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+from datetime import timedelta
+
+BOT_TOKEN = "123456:benchmark"
+GROUP_CHAT_ID = -1000000000001
+FIRST_USER_ID = 1_000_000
+
+def configure(database_url: str, **overrides) -> None:
+    """
+    Override the bot's config for a benchmark run, through GROUPMANAGER_CONFIG.
+
+    Args:
+        database_url (str): Connection string of the local benchmark database
+        **overrides: Other settings to override
+    """
+    if "config" in sys.modules:
+        raise RuntimeError("configure() must be called before the bot's modules are imported")
+
+    settings = json.loads(os.environ.get("GROUPMANAGER_CONFIG", "{}"))
+    settings.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "GROUP_CHAT_ID": GROUP_CHAT_ID,
+        "DB_CONNECTION_STRING": database_url,
+        **overrides,
+    })
+    os.environ["GROUPMANAGER_CONFIG"] = json.dumps(settings)
+
+def sqlite_url(path: str) -> str:
+    """
+    Get the connection string of a fresh SQLite database file.
+
+    Args:
+        path (str): Path of the database file, removed if it exists
+
+    Returns:
+        str: The aiosqlite connection string
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    return f"sqlite+aiosqlite:///{os.path.abspath(path)}"
+
+async def seed_users(count: int, expired: float, active: float, in_group: float,
+                     spread: str = "uniform", seed: int = 0, chunk_size: int = 10000) -> dict:
+    """
+    Insert synthetic users and subscriptions.
+
+    Args:
+        count (int): Number of users
+        expired (float): Fraction of users with an expired subscription
+        active (float): Fraction of users with an active subscription, the others have none
+        in_group (float): Fraction of users that are members of the group
+        spread (str, optional): 'uniform' spreads the deadlines over the past and next 7 days,
+            'burst' expires every expired subscription at the same time. Defaults to 'uniform'
+        seed (int, optional): Random seed. Defaults to 0
+        chunk_size (int, optional): Number of rows per INSERT. Defaults to 10000
+
+    Returns:
+        dict: The seeded user IDs ("users") and the IDs of the group members ("members")
+    """
+    from database.engine import engine
+    from database.models import User, Subscription
+    from utils.utils import utcnow
+
+    rng = random.Random(seed)
+    now = utcnow()
+    user_ids = list(range(FIRST_USER_ID, FIRST_USER_ID + count))
+    members = set()
+
+    async with engine.begin() as conn:
+        for start in range(0, count, chunk_size):
+            users, subscriptions = [], []
+            for user_id in user_ids[start:start + chunk_size]:
+                is_member = rng.random() < in_group
+                if is_member:
+                    members.add(user_id)
+                users.append({
+                    "chat_id": user_id, "user_id": user_id, "fullname": f"User {user_id}",
+                    "username": f"user{user_id}", "lang": "en", "inGroup": is_member,
+                })
+
+                draw = rng.random()
+                if draw < expired:
+                    offset = 1 if spread == "burst" else rng.uniform(1, 7 * 86400)
+                    subscriptions.append({"user_id": user_id, "expires_at": now - timedelta(seconds=offset)})
+                elif draw < expired + active:
+                    offset = rng.uniform(3600, 7 * 86400)
+                    subscriptions.append({"user_id": user_id, "expires_at": now + timedelta(seconds=offset)})
+
+            await conn.execute(User.__table__.insert(), users)
+            if subscriptions:
+                await conn.execute(Subscription.__table__.insert(), subscriptions)
+
+    return {"users": user_ids, "members": members}
+
+class QueryCounter:
+    """
+    Counts the SQL statements run by the shared engine, as timed by database.profiling.
+
+    Per-update counts come from database.profiling too, see the replay benchmark.
+    """
+
+    def __init__(self):
+        from database import profiling
+
+        self.stats = profiling.stats
+        self._count = self.stats["statements"]
+        self._time = self.stats["statement_time"]
+
+    def reset(self) -> dict:
+        """
+        Get the counters and start over.
+
+        Returns:
+            dict: Number of queries and their total time in seconds
+        """
+        count, total = self.stats["statements"], self.stats["statement_time"]
+        snapshot = {
+            "queries": count - self._count,
+            "query_time": round(total - self._time, 6),
+        }
+        self._count, self._time = count, total
+        return snapshot
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a periodic callback, i.e. how long it is blocked.
+
+    Attributes:
+        interval (float): Number of seconds between two samples
+        samples (list): Lag of each sample since the last reset, in seconds
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - expected, 0.0))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def reset(self) -> dict:
+        """
+        Get the lag statistics and start over.
+
+        Returns:
+            dict: Maximum, p99 and mean lag in milliseconds
+        """
+        samples, self.samples = self.samples, []
+        return {
+            "loop_lag_max_ms": round(max(samples, default=0.0) * 1000, 3),
+            "loop_lag_p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "loop_lag_mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        }
+
+def percentile(values: list, p: float) -> float:
+    """
+    Get a percentile of a list of values (nearest rank).
+
+    Args:
+        values (list): The values
+        p (float): The percentile, between 0 and 100
+
+    Returns:
+        float: The percentile, 0 if there are no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(max(round(p / 100 * len(ordered) + 0.5) - 1, 0), len(ordered) - 1)
+    return ordered[index]
+
+def memory_usage() -> dict:
+    """
+    Get the memory usage of the process.
+
+    Returns:
+        dict: Current and peak resident set size in KiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024  # ru_maxrss is in bytes on macOS
+
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        pass
+
+    # The two come from different sources (ru_maxrss counts in KiB, statm in pages),
+    # so the peak is never reported below the current usage
+    if current is not None:
+        peak = max(peak, current)
+
+    return {"rss_kb": current, "peak_rss_kb": peak}
+
+def environment() -> dict:
+    """
+    Describe the environment of a benchmark run.
+
+    Returns:
+        dict: Python, platform and database details
+    """
+    import sqlalchemy
+    from database.engine import engine
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "database": engine.dialect.name,
+    }
+
+def write_report(report: dict, output: str = None) -> None:
+    """
+    Write a benchmark report as JSON.
+
+    Args:
+        report (dict): The report
+        output (str, optional): Path of the output file. Defaults to stdout
+    """
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,148 @@
+"""
+Members Checker Benchmark
+
+This benchmark measures how the membership sweep scales with the number of users including:
+- Seeding a local database with synthetic users and a configurable expiry distribution
+- Running check_user_membership against the local fake Bot API
+- Reporting per cycle: wall time, DB queries, Telegram calls, memory and event loop lag
+
+Usage:
+    python -m benchmarks.members_checker --users 100000 --expired 0.2 --output results.json
+
+The first cycle removes the expired members, the following ones measure the steady state.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks import harness
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the members checker sweep.")
+    parser.add_argument("--users", type=int, default=10000, help="Number of synthetic users (default: 10000)")
+    parser.add_argument("--expired", type=float, default=0.2, help="Fraction of users with an expired subscription")
+    parser.add_argument("--active", type=float, default=0.5, help="Fraction of users with an active subscription")
+    parser.add_argument("--in-group", type=float, default=0.7, help="Fraction of users in the group")
+    parser.add_argument("--spread", choices=["uniform", "burst"], default="uniform",
+                        help="'uniform' spreads the deadlines over 7 days, 'burst' expires them all at once")
+    parser.add_argument("--cycles", type=int, default=3, help="Number of sweeps to run")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of each fake Bot API call")
+    parser.add_argument("--telegram-rate", type=float, default=1000,
+                        help="Calls per second allowed to the fake Bot API, 0 keeps the config's limits")
+    parser.add_argument("--page-size", type=int, default=None, help="Override Config['db_page_size']")
+    parser.add_argument("--database", default=None,
+                        help="Database connection string (default: a fresh SQLite file in the temp directory)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic data")
+    parser.add_argument("--output", default=None, help="Path of the JSON report (default: stdout)")
+    return parser.parse_args(argv)
+
+async def run(args: argparse.Namespace) -> dict:
+    """
+    Seed the database and run the sweeps.
+
+    Args:
+        args (argparse.Namespace): The command line arguments
+
+    Returns:
+        dict: The benchmark report
+    """
+    from config import Config
+    from database.main import create_tables
+    from database.engine import engine
+    from classes.MembershipMirror import membership_mirror
+    from classes.ShardLeases import shard_leases
+    from classes.EnforcementPipeline import enforcement_pipeline
+    from classes.RequestScheduler import scheduler
+    from bot.members_checker import check_user_membership
+    from benchmarks.fake_bot_api import FakeBotAPI
+
+    await create_tables()
+    started = time.perf_counter()
+    seeded = await harness.seed_users(
+        args.users, expired=args.expired, active=args.active,
+        in_group=args.in_group, spread=args.spread, seed=args.seed
+    )
+    seed_time = time.perf_counter() - started
+
+    api = FakeBotAPI(latency=args.latency_ms / 1000, members=set(seeded["members"]), admins=[harness.FIRST_USER_ID])
+    await api.start()
+    queries = harness.QueryCounter()
+    lag = harness.LoopLagMonitor()
+    lag.start()
+
+    cycles = []
+    try:
+        await membership_mirror.load()
+        await shard_leases.renew()
+
+        for cycle in range(args.cycles):
+            queries.reset()
+            lag.reset()
+            api.calls.clear()
+            stats_before = dict(enforcement_pipeline.stats)
+
+            started = time.perf_counter()
+            await check_user_membership()
+            wall_time = time.perf_counter() - started
+
+            stats = {
+                key: value - stats_before.get(key, 0)
+                for key, value in enforcement_pipeline.stats.items()
+            }
+            cycles.append({
+                "cycle": cycle + 1,
+                "wall_time": round(wall_time, 6),
+                **queries.reset(),
+                "telegram_calls": api.total_calls(),
+                "telegram_calls_by_method": dict(api.calls),
+                "enforcement": stats,
+                **harness.memory_usage(),
+                **lag.reset(),
+            })
+    finally:
+        await lag.stop()
+        await api.stop()
+
+    report = {
+        "benchmark": "members_checker",
+        "parameters": {
+            key: value for key, value in vars(args).items() if key not in ("output", "database")
+        },
+        "environment": harness.environment(),
+        "config": {
+            "db_page_size": Config["db_page_size"],
+            "enforcement_concurrency": Config["enforcement_concurrency"],
+            "enforcement_rate": Config["enforcement_rate"],
+            "telegram_global_rate": Config["telegram_global_rate"],
+        },
+        "seed_time": round(seed_time, 6),
+        "scheduler": scheduler.stats(),
+        "cycles": cycles,
+    }
+    await engine.dispose()
+    return report
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+
+    database_url = args.database or harness.sqlite_url(os.path.join(tempfile.gettempdir(), "members_checker_bench.sqlite"))
+    overrides = {}
+    if args.page_size:
+        overrides["db_page_size"] = args.page_size
+    if args.telegram_rate:
+        overrides.update({
+            "enforcement_rate": args.telegram_rate,
+            "telegram_global_rate": args.telegram_rate,
+        })
+    harness.configure(database_url, **overrides)
+
+    report = asyncio.run(run(args))
+    harness.write_report(report, args.output)
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    main()
@@ -0,0 +1,306 @@
+"""
+Update Replay Benchmark
+
+This benchmark measures the end-to-end throughput of the update handlers including:
+- Synthetic update streams (/start, the buy flow callbacks, email registration,
+  chat_member joins and the admin /add_sub conversation), or recorded ones
+- Replay into the bot's dispatcher (middlewares, filters, handlers) at a fixed rate
+- A local database and the local fake Bot API / CoinPayments
+- Reporting p50/p95/p99 handler latency, DB queries and outbound calls per update
+
+Usage:
+    python -m benchmarks.replay --users 500 --rate 200 --output replay.json
+    python -m benchmarks.replay --updates recorded.jsonl --rate 50
+
+Recorded streams are JSON lines, one Telegram Update object per line. --record
+writes the synthetic stream in that format.
+
+Updates are sent open-loop: each one is dispatched at its scheduled time whether or
+not the previous ones are done, so the latency includes any queueing in the bot.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks import harness
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}", "language_code": "en"}
+
+class UpdateFactory:
+    """
+    Builds synthetic Telegram updates.
+
+    Attributes:
+        group_chat_id (int): Chat ID of the managed group
+        update_id (int): ID of the last built update
+    """
+
+    def __init__(self, group_chat_id: int):
+        self.group_chat_id = group_chat_id
+        self.update_id = 0
+        self.message_id = 0
+
+    def _next(self) -> tuple:
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    def message(self, user_id: int, text: str) -> dict:
+        update_id, message_id = self._next()
+        message = {
+            "message_id": message_id, "date": int(time.time()), "text": text,
+            "chat": {"id": user_id, "type": "private", "first_name": f"User {user_id}"},
+            "from": _user(user_id),
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    def callback(self, user_id: int, data: str) -> dict:
+        update_id, message_id = self._next()
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": _user(user_id), "chat_instance": str(user_id), "data": data,
+            "message": {
+                "message_id": message_id, "date": int(time.time()), "text": "menu",
+                "chat": {"id": user_id, "type": "private", "first_name": f"User {user_id}"},
+                "from": {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"},
+            },
+        }}
+
+    def chat_member(self, user_id: int, old_status: str, new_status: str) -> dict:
+        update_id, _ = self._next()
+        return {"update_id": update_id, "chat_member": {
+            "chat": {"id": self.group_chat_id, "type": "supergroup", "title": "group"},
+            "from": _user(user_id), "date": int(time.time()),
+            "old_chat_member": {"user": _user(user_id), "status": old_status},
+            "new_chat_member": {"user": _user(user_id), "status": new_status},
+        }}
+
+def synthetic_stream(users: int, admin_sessions: int, coin: str, group_chat_id: int) -> list:
+    """
+    Build the synthetic update stream.
+
+    Every user runs the buy flow: /start, the payment method and coin screens, the
+    coin choice (which asks for an email), the email, the coin choice again (which
+    creates the transaction) and finally joins the group. The admin runs /add_sub
+    for some of the users. The sessions are interleaved step by step, so the updates
+    of one user are spread over the whole stream, like real traffic.
+
+    Args:
+        users (int): Number of user sessions
+        admin_sessions (int): Number of /add_sub conversations run by the admin
+        coin (str): coin_ref chosen in the buy flow
+        group_chat_id (int): Chat ID of the managed group
+
+    Returns:
+        list: Telegram Update objects, as dicts
+    """
+    factory = UpdateFactory(group_chat_id)
+    user_ids = [harness.FIRST_USER_ID + 1 + index for index in range(users)]
+    admin_id = harness.FIRST_USER_ID
+
+    steps = [
+        lambda user_id: factory.message(user_id, "/start"),
+        lambda user_id: factory.callback(user_id, "buyMembership"),
+        lambda user_id: factory.callback(user_id, "buyMembership:showCoins"),
+        lambda user_id: factory.callback(user_id, f"pay_membership:checkPoint {coin}"),
+        lambda user_id: factory.message(user_id, f"user{user_id}@example.com"),
+        lambda user_id: factory.callback(user_id, f"pay_membership:checkPoint {coin}"),
+        lambda user_id: factory.chat_member(user_id, "left", "member"),
+    ]
+    admin_steps = [
+        lambda user_id: factory.message(admin_id, "/add_sub"),
+        lambda user_id: factory.message(admin_id, str(user_id)),
+        lambda user_id: factory.message(admin_id, "24"),
+    ]
+
+    updates = [factory.message(admin_id, "/start")]
+    for step in steps:
+        updates.extend(step(user_id) for user_id in user_ids)
+
+    # The admin conversations run one after the other, after the users exist
+    for user_id in user_ids[:admin_sessions]:
+        updates.extend(step(user_id) for step in admin_steps)
+
+    return updates
+
+def update_kind(update: dict) -> str:
+    """
+    Classify an update for the per-kind report.
+
+    Args:
+        update (dict): Telegram Update object
+
+    Returns:
+        str: e.g. 'command:/start', 'callback:buyMembership', 'message' or 'chat_member'
+    """
+    if "message" in update:
+        text = update["message"].get("text", "")
+        return f"command:{text.split()[0]}" if text.startswith("/") else "message"
+    if "callback_query" in update:
+        data = update["callback_query"].get("data", "")
+        return f"callback:{data.split()[0]}"
+    return next((key for key in update if key != "update_id"), "unknown")
+
+def latency_stats(latencies: list) -> dict:
+    """Summarize latencies (in seconds) as milliseconds."""
+    return {
+        "count": len(latencies),
+        "p50_ms": round(harness.percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(harness.percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(harness.percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay Telegram updates into the bot's handlers.")
+    parser.add_argument("--updates", default=None, help="JSON lines file of recorded updates (default: synthetic stream)")
+    parser.add_argument("--record", default=None, help="Write the synthetic stream to this JSON lines file")
+    parser.add_argument("--users", type=int, default=200, help="Number of synthetic user sessions (default: 200)")
+    parser.add_argument("--admin-sessions", type=int, default=10, help="Number of synthetic /add_sub conversations")
+    parser.add_argument("--coin", default="BTC", help="coin_ref chosen in the synthetic buy flow")
+    parser.add_argument("--rate", type=float, default=100, help="Updates per second (default: 100)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of each fake Bot API / CoinPayments call")
+    parser.add_argument("--telegram-rate", type=float, default=0,
+                        help="Override Config['telegram_global_rate'], 0 keeps the config's limits")
+    parser.add_argument("--database", default=None,
+                        help="Database connection string (default: a fresh SQLite file in the temp directory)")
+    parser.add_argument("--output", default=None, help="Path of the JSON report (default: stdout)")
+    return parser.parse_args(argv)
+
+async def run(args: argparse.Namespace, updates: list) -> dict:
+    """
+    Replay the updates and measure them.
+
+    Args:
+        args (argparse.Namespace): The command line arguments
+        updates (list): Telegram Update objects, as dicts
+
+    Returns:
+        dict: The benchmark report
+    """
+    from telebot import types
+    from config import Config, bot
+    from database.main import create_tables
+    from database.engine import engine, pool_stats
+    from classes.CoinPayments import coinpayments
+    from classes.RequestScheduler import scheduler
+    from database import profiling
+    from bot.instance import SetupDispatcher
+    from benchmarks.fake_bot_api import FakeBotAPI
+
+    await create_tables()
+    SetupDispatcher()
+
+    api = FakeBotAPI(latency=args.latency_ms / 1000, admins=[harness.FIRST_USER_ID])
+    await api.start()
+    await coinpayments.start()
+    queries = harness.QueryCounter()
+    lag = harness.LoopLagMonitor()
+
+    latencies = defaultdict(list)
+    update_queries = []
+
+    async def process(update: dict, kind: str, scheduled_at: float) -> None:
+        # Started here so the count can be read after the middleware ended it
+        statements = profiling.begin_update(kind, update["update_id"], None)
+        await bot.process_new_updates([types.Update.de_json(update)])
+        latencies[kind].append(time.perf_counter() - scheduled_at)
+        update_queries.append(statements.count)
+
+    lag.start()
+    tasks = []
+    started = time.perf_counter()
+    try:
+        for index, update in enumerate(updates):
+            scheduled_at = started + index / args.rate
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(process(update, update_kind(update), scheduled_at)))
+
+        await asyncio.gather(*tasks)
+        wall_time = time.perf_counter() - started
+
+        # Let the queued outbound calls drain before counting them
+        while any(scheduler.stats()["queue_depth"].values()):
+            await asyncio.sleep(0.05)
+    finally:
+        await lag.stop()
+        await coinpayments.close()
+        await api.stop()
+
+    count = len(updates)
+    all_latencies = [latency for kind_latencies in latencies.values() for latency in kind_latencies]
+    total_queries = queries.reset()
+
+    report = {
+        "benchmark": "replay",
+        "parameters": {
+            key: value for key, value in vars(args).items() if key not in ("output", "database", "record")
+        },
+        "environment": harness.environment(),
+        "updates": count,
+        "wall_time": round(wall_time, 6),
+        "throughput": round(count / wall_time, 3) if wall_time else None,
+        "latency": latency_stats(all_latencies),
+        "latency_by_kind": {kind: latency_stats(values) for kind, values in sorted(latencies.items())},
+        "db_queries": total_queries["queries"],
+        "db_queries_per_update": round(total_queries["queries"] / count, 3) if count else 0,
+        "db_queries_per_update_p95": harness.percentile(update_queries, 95),
+        "db_query_time": total_queries["query_time"],
+        "updates_over_query_budget": profiling.stats["over_budget"],
+        "slow_queries": profiling.stats["slow_queries"],
+        "outbound_calls": api.total_calls(),
+        "outbound_calls_per_update": round(api.total_calls() / count, 3) if count else 0,
+        "outbound_calls_by_method": dict(api.calls),
+        "scheduler": scheduler.stats(),
+        "pool": pool_stats(),
+        **harness.memory_usage(),
+        **lag.reset(),
+        "config": {
+            "telegram_global_rate": Config["telegram_global_rate"],
+            "telegram_chat_rate": Config["telegram_chat_rate"],
+            "STATE_STORAGE": Config["STATE_STORAGE"],
+            "db_query_budget": Config["db_query_budget"],
+            "db_slow_query_threshold": Config["db_slow_query_threshold"],
+        },
+    }
+    await engine.dispose()
+    return report
+
+def load_updates(path: str) -> list:
+    """Read a JSON lines file of recorded updates."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+
+    database_url = args.database or harness.sqlite_url(os.path.join(tempfile.gettempdir(), "replay_bench.sqlite"))
+    overrides = {}
+    if args.telegram_rate:
+        overrides["telegram_global_rate"] = args.telegram_rate
+    harness.configure(database_url, **overrides)
+
+    if args.updates:
+        updates = load_updates(args.updates)
+    else:
+        updates = synthetic_stream(args.users, args.admin_sessions, args.coin, harness.GROUP_CHAT_ID)
+        if args.record:
+            with open(args.record, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(update) + "\n" for update in updates)
+
+    report = asyncio.run(run(args, updates))
+    harness.write_report(report, args.output)
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    main()
@@ -19,7 +19,8 @@ from utils.user import GetUser, is_admin
 from classes.User import User as UserClass
 from telebot.asyncio_handler_backends import State, StatesGroup
 from telebot.util import quick_markup
-from datetime import datetime, timedelta
+from datetime import timedelta
+from utils.utils import utcnow
 
 class AdminStates(StatesGroup):
     """
@@ -113,11 +114,8 @@ def setup_admin_functions(bot):
 
         async with state.data() as data:
             target_user_id = data.get("target_user_id")
-            now = datetime.now()
-            expiration_date = now + timedelta(hours=int(exp_time))
-            await MySQL.UpdateFieldForUser(target_user_id, "subscription_data", {
-                "expiration_date": expiration_date.timestamp()
-            })
+            expiration_date = utcnow() + timedelta(hours=int(exp_time))
+            await MySQL.SetSubscription(int(target_user_id), expiration_date, plan=f"{exp_time}h", source="admin")
 
             await state.delete()
             await User.SendMessage(User.locales["admin:success"].format(id=target_user_id))
@@ -1,14 +1,19 @@
 from telebot.util import quick_markup
-from typing import Dict, Any, Union
-from utils.utils import create_transaction
+from typing import Any
 from utils.user import GetUser, check_user
 from classes.User import User as UserClass
 from config import Config
-from utils.utils import is_email
+from utils.utils import is_email, utcnow
 from database import MySQL
 from classes.GroupManager import GroupManager as GM
-from datetime import datetime, timezone
+from classes.AdminCache import admin_cache
+from classes.MembershipMirror import membership_mirror
+from classes.RequestScheduler import scheduler
+from classes.ScreenCache import screen_cache
+from classes.CoinPayments import coinpayments
 from telebot.asyncio_handler_backends import State, StatesGroup
+from datetime import timedelta
+from sqlalchemy.exc import IntegrityError
 
 class HandlersStates(StatesGroup):
     """
@@ -27,21 +32,19 @@ def setup_handlers(bot):
     async def start(message):
         user_id = message.chat.id
         User: UserClass = await GetUser(user_id)
-        subscription_data = User.user_data.subscription_data
-        exp_date = str(datetime.fromtimestamp(int(subscription_data['expiration_date']), tz=timezone.utc)) if subscription_data else None
-        text: str = User.locales['start:onSubscription'].format(id=user_id, exp_date=exp_date.split()[0]) if subscription_data else User.locales['start:noSubscription'].format(id=user_id)
-        buttons: Dict[str, Dict[str, str]] = {}
+        subscription = User.user_data.subscription
+        subscriptionActive = subscription is not None and subscription.expires_at > utcnow()
+        text: str = User.locales['start:onSubscription'].format(id=user_id, exp_date=subscription.expires_at.date()) if subscriptionActive else User.locales['start:noSubscription'].format(id=user_id)
 
-        if User.user_data.subscription_data:
+        if subscriptionActive:
             GroupManager = GM()
-            buttons[User.locales['joinGroup']] = {'url': await GroupManager.CreateInviteLink(user_id)}
+            markup: Any = quick_markup({
+                User.locales['joinGroup']: {'url': await GroupManager.CreateInviteLink(user_id)},
+                User.locales['start:support']: {'callback_data': 'support'}
+            }, row_width=1)
         else:
-            buttons[User.locales['start:buyMembership']] = {'callback_data': 'buyMembership'}
+            markup: Any = screen_cache.start_no_subscription(User.locales)
 
-        buttons[User.locales['start:support']] = {'callback_data': 'support'}
-
-        markup: Any = quick_markup(buttons, row_width=1)
-        
         await User.EditMessage(text, reply_markup=markup)
 
 
@@ -51,10 +54,7 @@ def setup_handlers(bot):
         User: UserClass = await GetUser(message.chat.id)
 
         text: str = User.locales["membership:buying:giveMethods"]
-        markup: Any = quick_markup({
-            User.locales['membership:buying:buyWithCrypto']: {'callback_data': 'buyMembership:showCoins'},
-            User.locales['back']: {'callback_data': 'start'}
-        }, row_width=1)
+        markup: Any = screen_cache.buy_membership(User.locales)
         await User.EditMessage(text, reply_markup=markup)
 
 
@@ -64,14 +64,7 @@ def setup_handlers(bot):
         User: UserClass = await GetUser(message.chat.id)
 
         text: str = User.locales["membership:buying:showCoins"]
-        buttons: Dict[str, Dict[str, str]] = {
-            **{
-                f"{coin['name']} - {coin['network']}": {'callback_data': f"pay_membership:checkPoint {coin['coin_ref']}"}
-                for coin in Config["coins"]
-            },
-            User.locales['back']: {'callback_data': 'buyMembership'}
-        }
-        markup: Any = quick_markup(buttons, row_width=1)
+        markup: Any = screen_cache.show_coins(User.locales)
 
         await User.EditMessage(text, reply_markup=markup)
 
@@ -91,28 +84,44 @@ def setup_handlers(bot):
 
     async def pay_membership_givePaymentInfo(message, coin_ref):
         User: UserClass = await GetUser(message.chat.id)
-        coin = next((coin for coin in Config["coins"] if coin["coin_ref"] == coin_ref), None)
+        coin = screen_cache.coins_by_ref.get(coin_ref)
 
         text = User.locales["error_getting_data"]
-        markup: Any = quick_markup({
-            User.locales['back']: {'callback_data': 'buyMembership:showCoins'}
-        }, row_width=1)
-
-        result = await create_transaction(User.user_data.fullname, User.user_data.email, coin_ref)
-        if result:
-            timeout = int(result["timeout"])
+        markup: Any = screen_cache.back_to_coins(User.locales)
+
+        # Serve a still payable transaction for the same coin instead of creating a new one
+        now = utcnow()
+        payment = await MySQL.GetPendingPayment(User.user_data.user_id, coin_ref, now) if coin else None
+
+        if coin and not payment:
+            result = await coinpayments.create_transaction(User.user_data.fullname, User.user_data.email, coin_ref)
+            if result:
+                payment = await MySQL.CreatePayment(
+                    txn_id=result["txn_id"],
+                    user_id=User.user_data.user_id,
+                    coin=coin_ref,
+                    amount=result["amount"],
+                    address=result["address"],
+                    qrcode_url=result["qrcode_url"],
+                    status_url=result["status_url"],
+                    deadline=now + timedelta(seconds=int(result["timeout"])),
+                    created_at=now,
+                )
+
+        if payment:
+            timeout = max(int((payment.deadline - now).total_seconds()), 0)
             hours = timeout // 3600
             minutes = (timeout % 3600) // 60
             seconds = (timeout % 3600) % 60
             text = User.locales["membership:givePaymentInfo"].format(
-                amount = result["amount"],
+                amount = payment.amount,
                 currency = f"{coin['name']} - {coin['network']}",
-                address = result["address"],
+                address = payment.address,
                 deadline=f"{hours:02}h:{minutes:02}m:{seconds:02}s",
-                status_url = result["status_url"]
+                status_url = payment.status_url
             )
 
-            await User.SendPhoto(result["qrcode_url"], text, reply_markup=markup)
+            await User.SendPhoto(payment.qrcode_url, text, reply_markup=markup)
             return
         
         await User.EditMessage(text, reply_markup=markup)
@@ -134,17 +143,23 @@ def setup_handlers(bot):
             await User.SendMessage(User.locales["email:notValid"])
             return
         
-        email_exists_in_db = await MySQL.GetUserByField("email", text)
-        if email_exists_in_db:
+        # The unique constraint on users.email decides who gets the address
+        try:
+            linked = await MySQL.ClaimEmail(message.chat.id, text)
+        except IntegrityError:
             await User.SendMessage(User.locales["email:alreadyExists"])
             return
+
+        if not linked:
+            # The user's record couldn't be created yet, check_user retries on their next update
+            await User.SendMessage(User.locales["userNotFound"])
+            return
         
-        await MySQL.UpdateFieldForUser(message.chat.id, "email", text)
         await User.SendMessage(User.locales["email:successfullyLinked"])
 
     @bot.callback_query_handler(func=lambda call: call.data.startswith("support"))
     async def support(call):
-        await bot.send_message(call.message.chat.id, "Coming soon...")
+        await scheduler.call("send_message", chat_id=call.message.chat.id, text="Coming soon...")
 
 
     @bot.message_handler(state="*", commands=["cancel"])
@@ -167,4 +182,20 @@ def setup_handlers(bot):
     @bot.chat_member_handler()
     async def chat_member_handler(update):
         user_id = update.from_user.id
-        await check_user(update)
\ No newline at end of file
+        await check_user(update)
+
+        if str(update.chat.id) != str(Config["GROUP_CHAT_ID"]):
+            return
+
+        # Mirror joins, leaves and kicks so enforcement doesn't have to ask Telegram
+        await membership_mirror.set_member(
+            update.new_chat_member.user.id,
+            membership_mirror.is_chat_member(update.new_chat_member)
+        )
+
+        # Refresh the cached admins as soon as someone is promoted or demoted
+        admin_statuses = ('administrator', 'creator')
+        wasAdmin = update.old_chat_member.status in admin_statuses
+        isAdmin = update.new_chat_member.status in admin_statuses
+        if wasAdmin != isAdmin:
+            admin_cache.invalidate()
\ No newline at end of file
@@ -6,11 +6,13 @@ This module handles the initialization and setup of the Telegram bot instance in
 - Middleware setup
 - Handler registration
 - Background task initialization
+- Receiving updates by long polling or by webhook
 
 The module serves as the central point for bot setup and configuration.
 """
 
 import asyncio
+import uvicorn
 from config import Config, bot
 from telebot import asyncio_filters
 from telebot.states.asyncio.middleware import StateMiddleware
@@ -18,24 +20,38 @@ from bot.middlewares import Middleware
 from bot.handlers import setup_handlers
 from bot.members_checker import start_members_checker
 from bot.admin import setup_admin_functions
+from classes.LocaleCatalog import locale_catalog
+from classes.ScreenCache import screen_cache
+from classes.RateQuotes import rate_quotes
+from classes.StateStorage import SharedStateStorage, create_state_storage
+from classes.Metrics import metrics, instrument_handlers, serve_metrics
+from api.api import app
 
-async def StartBot():
+# Update types the bot handles, in both update modes
+ALLOWED_UPDATES = ["chat_member", "message", "callback_query"]
+
+def SetupDispatcher():
     """
-    Initialize and start the Telegram bot.
+    Register the filters, middlewares and handlers processing the updates.
 
     This function:
-    1. Sets up state management filters
+    1. Sets up the state storage and state management filters
     2. Configures middleware for state and user management
     3. Registers message and callback handlers
     4. Initializes admin functionality
-    5. Starts the background member checker
-    6. Begins polling for updates
+    5. Times the handlers for /metrics
+    6. Builds the static keyboards
 
     The bot is configured to handle:
     - Chat member updates
     - Messages
     - Callback queries
     """
+    # Use the state storage selected in the config. It is built here rather than in
+    # config.py because the shared storages depend on the database module, which imports config.
+    state_storage = create_state_storage(Config["STATE_STORAGE"], Config["state_ttl"], Config["REDIS_URL"])
+    bot.current_states = state_storage
+
     # Add state filter for handling user states
     bot.add_custom_filter(asyncio_filters.StateFilter(bot))
     
@@ -46,9 +62,83 @@ async def StartBot():
     # Register message handlers and admin functions
     setup_handlers(bot)
     setup_admin_functions(bot)
-    
+    instrument_handlers(bot, ALLOWED_UPDATES)
+
+    # Build the static keyboards of every locale up front
+    screen_cache.warm()
+
+def StartBackgroundTasks():
+    """Start the background member checker, locale reloader, rate refresher and the purge of expired conversation states."""
     # Start background task for checking member status
     asyncio.create_task(start_members_checker())
 
-    # Start polling for updates
-    await bot.polling(allowed_updates=["chat_member", "message", "callback_query"])
+    # Start background task reloading the locales when their files change
+    asyncio.create_task(locale_catalog.watch(Config["locales_reload_interval"]))
+
+    # Start background task refreshing the exchange rates shown on the coin screen
+    asyncio.create_task(rate_quotes.watch(Config["rates_refresh_interval"]))
+
+    # Start background task deleting expired conversations from the shared state storage
+    if isinstance(bot.current_states, SharedStateStorage):
+        asyncio.create_task(bot.current_states.purge_expired(Config["state_purge_interval"]))
+
+def SetupBot():
+    """Set up the Telegram bot: register the update processing and start the background tasks."""
+    SetupDispatcher()
+    StartBackgroundTasks()
+
+async def StartPolling():
+    """
+    Receive updates by long polling.
+
+    The API app runs in its own process in this mode, so the metrics of the bot
+    process are served on Config["metrics_port"] unless it is 0.
+    """
+    metrics_server = None
+    if Config["metrics_port"]:
+        metrics_server = await serve_metrics(metrics, Config["metrics_host"], Config["metrics_port"], Config["METRICS_TOKEN"])
+
+    try:
+        # getUpdates is refused while a webhook is set
+        await bot.delete_webhook()
+        await bot.polling(allowed_updates=ALLOWED_UPDATES)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+
+async def StartWebhook():
+    """
+    Receive updates through the webhook endpoint of the API app.
+
+    Registers the webhook with Telegram and serves the API app in this process,
+    so the payment notifications are handled on the same event loop.
+
+    Raises:
+        ValueError: If WEBHOOK_URL or WEBHOOK_SECRET is not configured
+    """
+    if not Config["WEBHOOK_URL"] or not Config["WEBHOOK_SECRET"]:
+        raise ValueError("WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode")
+
+    await bot.set_webhook(
+        url=Config["WEBHOOK_URL"].rstrip("/") + Config["webhook_path"],
+        secret_token=Config["WEBHOOK_SECRET"],
+        allowed_updates=ALLOWED_UPDATES,
+        max_connections=Config["webhook_max_connections"],
+    )
+
+    server = uvicorn.Server(uvicorn.Config(app, host=Config["webhook_host"], port=Config["webhook_port"]))
+    await server.serve()
+
+async def StartBot():
+    """
+    Set up the Telegram bot and start receiving updates.
+
+    Updates are received by long polling, or through the API app's webhook
+    endpoint when Config["UPDATE_MODE"] is 'webhook'.
+    """
+    SetupBot()
+
+    if Config["UPDATE_MODE"] == "webhook":
+        await StartWebhook()
+    else:
+        await StartPolling()
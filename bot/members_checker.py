@@ -1,86 +1,203 @@
 """
 Members Checker Module
 
-This module implements periodic membership verification functionality including:
+This module implements membership verification functionality including:
 - Subscription expiration checks
 - Group membership validation
 - Automatic member removal
 - Admin privilege verification
 
-The module runs continuous checks to ensure only valid subscribers and admins
-remain in the group.
+Expirations are driven by the shared ExpiryScheduler, which wakes the checker only
+when a subscription deadline is due. A periodic full sweep keeps the scheduler seeded
+and removes members that are in the group without an active subscription.
+
+When several bot processes run, each one only handles the users of the shards it
+holds a lease on (see ShardLeases), so every user is processed by one process.
+
+The cycle durations, the enforcement backlog and how late expired subscriptions
+are handled are served on /metrics.
 """
 
 import asyncio
-from datetime import datetime, timezone
+from datetime import timedelta
 from utils.logger import get_logger
 
+from config import Config
 from database import MySQL
-from classes.GroupManager import GroupManager as GM
+from utils.utils import utcnow
+from classes.ExpiryScheduler import expiry_scheduler
+from classes.AdminCache import admin_cache
+from classes.EnforcementPipeline import enforcement_pipeline
+from classes.MembershipMirror import membership_mirror
+from classes.ShardLeases import shard_leases
+from classes.Metrics import metrics
 
 logger = get_logger(__name__)
 
-async def process_user(user, admins, GroupManager):
+checker_cycle_duration = metrics.histogram(
+    "checker_cycle_duration_seconds", "Duration of the members checker cycles", labels=("cycle",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+)
+checker_expiry_lag = metrics.histogram(
+    "checker_expiry_lag_seconds", "Time between a subscription deadline and its expiry by the checker",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+)
+metrics.gauge(
+    "checker_backlog", "Users queued on the enforcement pipeline",
+    collect=lambda: len(enforcement_pipeline.pending)
+)
+metrics.gauge(
+    "checker_scheduled_expirations", "Subscription deadlines held by the expiry scheduler",
+    collect=lambda: len(expiry_scheduler)
+)
+metrics.gauge(
+    "checker_shards_owned", "Members checker shards leased by this process",
+    collect=lambda: len(shard_leases.owned)
+)
+metrics.counter(
+    "enforcement_total", "Progress of the enforcement pipeline", labels=("result",),
+    collect=lambda: enforcement_pipeline.stats
+)
+
+async def process_users(entries, admins):
     """
-    Process a single user's membership status.
+    Process the membership status of a batch of users.
 
-    This function checks the user's subscription status and group membership,
-    taking appropriate action if needed (e.g., removing expired members).
+    Active subscriptions are left alone, the expired ones of the batch are deleted
+    with one bulk statement per chunk, and the users left without a subscription are
+    queued on the enforcement pipeline, which checks their group membership and
+    removes them at a rate Telegram allows. The mirrored membership of those users
+    is reloaded first, as chat_member events may have reached another process.
 
     Args:
-        user: User object to process
-        admins: List of group administrators
-        GroupManager: Instance of GroupManager class
+        entries: List of (user ID, Subscription object or None) pairs
+        admins: Set of group administrator user IDs
     """
-    user_id = user.user_id
-    User = await MySQL.GetUserById(user_id)
-    subscription_data = User.subscription_data
-
-    # Check subscription status
-    if subscription_data:
-        exp_date = datetime.fromtimestamp(int(subscription_data['expiration_date']), tz=timezone.utc)
-        subscriptionActive = exp_date > datetime.now(timezone.utc)
-    else:
-        subscriptionActive = False
-
-    # Handle expired or missing subscriptions
-    if not subscriptionActive:
-        isAdmin = next((True for admin in admins if user_id == admin.user.id), False)
-        userInGroup = await GroupManager.isMemberInGroup(user_id)
-
-        # Clear expired subscription data
-        if subscription_data:
-            await MySQL.UpdateFieldForUser(user.chat_id, "subscription_data", None)
-
-        # Remove non-admin users with expired subscriptions
-        if userInGroup and not isAdmin:
-            await GroupManager.KickMember(user_id)
+    now = utcnow()
+
+    # Users of shards owned by other processes are handled there, and users
+    # with an active subscription are handled when their deadline is due
+    entries = [
+        (user_id, subscription) for user_id, subscription in entries
+        if shard_leases.owns(user_id) and not (subscription and subscription.expires_at > now)
+    ]
+
+    # Clear the expired subscriptions, except those extended in the meantime
+    lapsed = [user_id for user_id, subscription in entries if subscription]
+    expired = set(await MySQL.DeleteExpiredSubscriptions(lapsed, now)) if lapsed else set()
+
+    # Other processes may have seen these users join or leave
+    candidates = [user_id for user_id, subscription in entries if not subscription or user_id in expired]
+    await membership_mirror.refresh(candidates)
+
+    for user_id, subscription in entries:
+        if subscription and user_id not in expired:
+            continue
+
+        # Remove non-admin users with expired or missing subscriptions, unless they are known to be out of the group
+        if user_id not in admins and membership_mirror.get(user_id) is not False:
+            await enforcement_pipeline.submit(user_id)
+
+async def check_expired_subscriptions():
+    """
+    Expire every subscription of the owned shards whose deadline has passed.
+
+    The expired subscriptions are read page by page with an index range scan on
+    subscriptions.expires_at, so this also catches subscriptions changed by
+    other processes since the scheduler was seeded.
+    """
+    if not shard_leases.owned:
+        return
+
+    admins = None
+    before = utcnow()
+    async for subscriptions in MySQL.IterExpiredSubscriptionPages(before, shard_leases.shards, shard_leases.owned):
+        if admins is None:
+            admins = await admin_cache.get()
+
+        now = utcnow()
+        for subscription in subscriptions:
+            checker_expiry_lag.observe(max((now - subscription.expires_at).total_seconds(), 0.0))
+
+        await process_users([(subscription.user_id, subscription) for subscription in subscriptions], admins)
+
+async def schedule_upcoming_expirations(until):
+    """
+    Seed the expiry scheduler with every subscription expiring before the given time.
+
+    Args:
+        until: Naive UTC datetime up to which subscriptions are scheduled
+    """
+    subscriptions = await MySQL.GetSubscriptionsExpiringBetween(utcnow(), until)
+    for subscription in subscriptions:
+        if shard_leases.owns(subscription.user_id):
+            expiry_scheduler.schedule(subscription.user_id, subscription.expires_at)
 
 async def check_user_membership():
     """
     Check membership status for all users.
 
     This function:
-    1. Retrieves all users from the database
-    2. Gets current group administrators
-    3. Processes each user's membership status concurrently
+    1. Gets current group administrators
+    2. Streams the users from the database page by page, together with their subscription
+    3. Processes the users of each page as one batch
+    4. Waits until the enforcement pipeline removed every queued user
+
+    Only one page of users is held in memory at a time.
     """
-    GroupManager = GM()
-    users = await MySQL.GetAllUsers()
-    admins = await GroupManager.GetAdmins()
+    admins = await admin_cache.get()
+
+    async for users in MySQL.IterUserPages():
+        await process_users([(user.user_id, user.subscription) for user in users], admins)
 
-    async with asyncio.TaskGroup() as tg:
-        for user in users:
-            tg.create_task(process_user(user, admins, GroupManager))
+    await enforcement_pipeline.join()
 
 async def start_members_checker():
     """
     Start the continuous membership checking process.
 
-    This function runs indefinitely, performing membership checks every 3 seconds.
-    It ensures that only users with valid subscriptions or admin privileges
-    remain in the group.
+    This function runs indefinitely. It performs a full sweep every
+    Config["members_sweep_interval"] seconds and, in between, sleeps until the
+    next subscription deadline is due. It ensures that only users with valid
+    subscriptions or admin privileges remain in the group.
+
+    The shard leases are renewed in the background, and a sweep runs early
+    whenever a shard is gained, to pick up the users of that shard.
     """
+    await membership_mirror.load()
+
+    try:
+        await shard_leases.renew()
+    except Exception as e:
+        logger.error("Error while claiming the members checker shards: %s", e)
+    asyncio.create_task(shard_leases.run(Config["checker_lease_renew_interval"]))
+
+    loop = asyncio.get_running_loop()
+    next_sweep = loop.time()
+    swept_shards = frozenset()
+
     while True:
-        await check_user_membership()
-        await asyncio.sleep(3)  # Wait 3 seconds between checks
+        try:
+            swept_shards &= shard_leases.owned
+            if loop.time() >= next_sweep or shard_leases.owned - swept_shards:
+                sweep_interval = Config["members_sweep_interval"]
+                swept_shards = shard_leases.owned
+                if swept_shards:
+                    with checker_cycle_duration.time(cycle="sweep"):
+                        await check_user_membership()
+                        await schedule_upcoming_expirations(utcnow() + timedelta(seconds=sweep_interval))
+                next_sweep = loop.time() + sweep_interval
+                logger.info(
+                    "Membership sweep done for shards %s, %d subscriptions scheduled, enforcement stats: %s",
+                    sorted(swept_shards), len(expiry_scheduler), dict(enforcement_pipeline.stats)
+                )
+
+            # The due user IDs only wake the checker, the expired subscriptions are read from the database.
+            # Wake up at least once per lease renewal to notice shards changing owner.
+            timeout = min(next_sweep - loop.time(), Config["checker_lease_renew_interval"])
+            if await expiry_scheduler.wait_due(timeout=timeout):
+                with checker_cycle_duration.time(cycle="expired"):
+                    await check_expired_subscriptions()
+        except Exception as e:
+            logger.error("Error in the members checker: %s", e, exc_info=True)
+            await asyncio.sleep(3)
@@ -7,10 +7,14 @@ performing tasks such as:
 - User verification
 - Update filtering
 - Pre-processing of messages and callbacks
+- Counting the database queries of each update
 """
 
-from telebot import asyncio_handler_backends
+from telebot import asyncio_handler_backends, types
 from utils.user import check_user
+from classes.StateStorage import begin_update
+from database import profiling
+from utils.logger import set_log_context
 
 class Middleware(asyncio_handler_backends.BaseMiddleware):
     """
@@ -39,24 +43,34 @@ class Middleware(asyncio_handler_backends.BaseMiddleware):
         Process updates before they reach handlers.
 
         This method ensures that user data exists in the database
-        for any user interacting with the bot.
+        for any user interacting with the bot, and starts the update's
+        memo of conversation states, count of database queries and
+        log context.
 
         Args:
             message: The incoming update (message or callback query)
             data: Additional data passed through middleware chain
         """
+        # Middlewares don't see the update itself, so the message or callback query ID identifies it
+        if isinstance(message, types.CallbackQuery):
+            update_type, event_id = "callback_query", message.id
+        else:
+            update_type, event_id = "message", message.message_id
+        set_log_context(update_type=update_type, event_id=event_id, user_id=message.from_user.id)
+        profiling.begin_update(update_type, event_id, message.from_user.id)
+        begin_update()
         await check_user(message)
 
     async def post_process(self, message, data, exception):
         """
         Process updates after they've been handled.
 
-        Currently implemented as a pass-through, but can be extended
-        to handle post-processing tasks or error handling.
+        Ends the update's count of database queries, updates over the
+        query budget are logged with their repeated queries.
 
         Args:
             message: The processed update
             data: Additional data from middleware chain
             exception: Any exception that occurred during handling
         """
-        pass
+        profiling.end_update()
@@ -0,0 +1,86 @@
+"""
+AdminCache Class
+
+This module provides a shared cache of the group administrators including:
+- A set of administrator user IDs for O(1) admin checks
+- Time-based expiry of the cached set
+- Single-flight refreshing, so concurrent callers share one API call
+- Immediate invalidation when an admin is promoted or demoted
+"""
+
+import asyncio
+import time
+
+from config import Config
+from classes.GroupManager import GroupManager as GM
+
+class AdminCache:
+    """
+    A TTL cache of the group administrators' user IDs.
+
+    Attributes:
+        ttl (float): Number of seconds a fetched admin set stays valid
+        admins (frozenset): The cached administrator user IDs, None before the first fetch
+        expires_at (float): Monotonic time at which the cached set expires
+    """
+
+    def __init__(self, ttl: float):
+        """
+        Initialize an empty admin cache.
+
+        Args:
+            ttl (float): Number of seconds a fetched admin set stays valid
+        """
+        self.ttl = ttl
+        self.admins = None
+        self.expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self.admins is not None and time.monotonic() < self.expires_at
+
+    async def get(self) -> frozenset:
+        """
+        Get the administrator user IDs, refreshing them if the cache expired.
+
+        Returns:
+            frozenset: User IDs of the group administrators
+        """
+        if self._is_fresh():
+            return self.admins
+
+        async with self._lock:
+            # Another caller may have refreshed the set while we were waiting
+            if self._is_fresh():
+                return self.admins
+
+            generation = self._generation
+            admins = await GM().GetAdmins()
+            self.admins = frozenset(admin.user.id for admin in admins)
+
+            # Keep the set expired if it was invalidated during the fetch
+            if generation == self._generation:
+                self.expires_at = time.monotonic() + self.ttl
+
+        return self.admins
+
+    async def is_admin(self, user_id: int | str) -> bool:
+        """
+        Check if a user is a group administrator.
+
+        Args:
+            user_id (int | str): Telegram user ID to check
+
+        Returns:
+            bool: True if the user is an administrator, False otherwise
+        """
+        return int(user_id) in await self.get()
+
+    def invalidate(self) -> None:
+        """Expire the cached set so the next call fetches it again."""
+        self._generation += 1
+        self.expires_at = 0.0
+
+# Shared admin cache instance
+admin_cache = AdminCache(ttl=Config["admin_cache_ttl"])
@@ -0,0 +1,124 @@
+"""
+CoinPayments Class
+
+This module provides a long-lived client for the CoinPayments API including:
+- A pooled HTTP session with keep-alive connections and DNS caching
+- Per-call timeouts
+- A generic signed command method reusable for every API command
+
+The client is started with the bot and closed at shutdown, so purchase clicks reuse
+an open TLS connection instead of paying for a new handshake every time.
+"""
+
+import asyncio
+import urllib.parse
+import aiohttp
+from typing import Any
+
+from config import Config
+from utils.logger import get_logger
+from utils.utils import generate_hmac_signature
+
+logger = get_logger(__name__)
+
+API_URL = "https://www.coinpayments.net/api.php"
+
+class CoinPaymentsClient:
+    """
+    A client for the CoinPayments API.
+
+    Attributes:
+        public_key (str): The CoinPayments public key
+        timeout (aiohttp.ClientTimeout): Default timeout of a call
+        session (aiohttp.ClientSession): The pooled HTTP session, None until started
+    """
+
+    def __init__(self, public_key: str, timeout: float):
+        """
+        Initialize the client, the HTTP session is created by start() or the first call.
+
+        Args:
+            public_key (str): The CoinPayments public key
+            timeout (float): Default number of seconds a call may take
+        """
+        self.public_key = public_key
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+
+    async def start(self) -> None:
+        """Create the pooled HTTP session if it is not open yet."""
+        if self.session is not None and not self.session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=Config["coinpayments_max_connections"],
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        """Close the HTTP session and its connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def call(self, cmd: str, timeout: float = None, **params) -> Any:
+        """
+        Run a signed CoinPayments API command.
+
+        Args:
+            cmd (str): The API command, e.g. "create_transaction" or "rates"
+            timeout (float, optional): Number of seconds the call may take. Defaults to the client timeout
+            **params: Parameters of the command
+
+        Returns:
+            Any: The command's result if successful, None if it failed or timed out
+        """
+        await self.start()
+
+        params = {'version': "1", 'key': self.public_key, 'cmd': cmd, **params}
+        encoded_params: str = urllib.parse.urlencode(params)
+        hmac_sign: str = generate_hmac_signature(encoded_params)
+
+        headers: dict = {
+            'HMAC': hmac_sign,
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+        options: dict = {'timeout': aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+
+        try:
+            async with self.session.post(API_URL, headers=headers, data=encoded_params, **options) as response:
+                if response.status == 200:
+                    data: Any = await response.json()
+                    if data['error'] == 'ok':
+                        return data['result']
+                    logger.warning("CoinPayments %s failed: %s", cmd, data['error'])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("CoinPayments %s failed: %r", cmd, e)
+
+        return None
+
+    async def create_transaction(self, buyer_name: str, buyer_email: str, currency: str) -> Any:
+        """
+        Create a new transaction for the subscription price.
+
+        Args:
+            buyer_name (str): Name of the buyer
+            buyer_email (str): Email of the buyer
+            currency (str): Currency code the buyer pays with
+
+        Returns:
+            Any: Transaction details if successful, None if failed
+        """
+        return await self.call(
+            "create_transaction",
+            amount=Config["subscription_price"],
+            currency1="USD",
+            currency2=currency,
+            buyer_name=buyer_name,
+            buyer_email=buyer_email,
+        )
+
+# Shared CoinPayments client instance
+coinpayments = CoinPaymentsClient(Config["PUBLIC_KEY"], timeout=Config["coinpayments_timeout"])
@@ -0,0 +1,183 @@
+"""
+EnforcementPipeline Class
+
+This module provides the worker pool that removes users from the group including:
+- A bounded queue of users to check and remove
+- A fixed number of workers (the concurrency ceiling), each taking the queued users in batches
+- A token bucket pacing the Telegram calls made in the group
+- Membership read from the local MembershipMirror, with getChatMember as a fallback
+- Progress counters
+
+The calls are sent with background priority through the RequestScheduler, which
+also retries them after 429 errors, so they never delay replies to users.
+
+A mass expiry is drained at the rate allowed by the bucket instead of bursting
+every Telegram call at once and failing on flood limits part of the way through.
+
+A user is only removed if they still have no active subscription when their batch
+is taken, so payments made while they were queued are respected. The subscriptions
+of a batch are checked with one SELECT and its membership changes are written with
+one UPDATE per state.
+"""
+
+import asyncio
+from collections import Counter
+
+from config import Config
+from database import MySQL
+from utils.logger import get_logger
+from utils.utils import utcnow
+from classes.TokenBucket import TokenBucket
+from classes.GroupManager import GroupManager as GM
+from classes.RequestScheduler import Priority
+from classes.MembershipMirror import membership_mirror
+
+logger = get_logger(__name__)
+
+class EnforcementPipeline:
+    """
+    A worker pool that removes users without an active subscription from the group.
+
+    Attributes:
+        concurrency (int): Number of workers processing the queue
+        bucket (TokenBucket): Token bucket pacing the Telegram calls
+        stats (Counter): Progress counters (queued, checked, kicked, not_in_group, renewed, failed)
+    """
+
+    def __init__(self, concurrency: int, rate: float):
+        """
+        Initialize the pipeline, the workers are started on the first submit().
+
+        Args:
+            concurrency (int): Number of workers processing the queue
+            rate (float): Maximum number of Telegram calls per second
+        """
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate)
+        self.stats = Counter()
+        self.pending = set()
+        self.queue = None
+        self.workers = []
+        self.GroupManager = GM(priority=Priority.BACKGROUND)
+
+    def start(self) -> None:
+        """Start the workers if they are not running yet."""
+        if self.workers:
+            return
+
+        self.queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def submit(self, user_id: int) -> None:
+        """
+        Queue a user for removal from the group.
+
+        Waits while the queue is full, so producers are slowed down to the
+        rate at which the workers drain it. Users already queued are skipped.
+
+        Args:
+            user_id (int): Telegram user ID of the user to remove
+        """
+        self.start()
+        if user_id in self.pending:
+            return
+
+        self.pending.add(user_id)
+        self.stats["queued"] += 1
+        await self.queue.put(user_id)
+
+    async def join(self) -> None:
+        """Wait until every queued user has been processed."""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def _call(self, func, *args):
+        """
+        Make a Telegram call paced by the pipeline's token bucket.
+
+        Args:
+            func: The coroutine function to call
+            *args: Arguments for the function
+
+        Returns:
+            Any: The result of the call
+        """
+        await self.bucket.acquire()
+        return await func(*args)
+
+    async def _next_batch(self) -> list:
+        """Wait for a queued user and take the users queued after them, up to Config["db_page_size"]."""
+        batch = [await self.queue.get()]
+        while len(batch) < Config["db_page_size"] and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _check_members(self, batch: list) -> list:
+        """
+        Find the members of the group in a batch, asking Telegram about users not in the mirror.
+
+        Args:
+            batch (list): Telegram user IDs
+
+        Returns:
+            list: IDs of the users in the group
+        """
+        members = []
+        for user_id in batch:
+            userInGroup = membership_mirror.get(user_id)
+            if userInGroup is None:
+                try:
+                    userInGroup = await self._call(self.GroupManager.isMemberInGroup, user_id)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    logger.error("Failed to check if user %s is in the group: %s", user_id, e)
+                    continue
+                membership_mirror.record(user_id, userInGroup)
+                self.stats["checked"] += 1
+
+            if userInGroup:
+                members.append(user_id)
+            else:
+                self.stats["not_in_group"] += 1
+        return members
+
+    async def _kick(self, user_id: int) -> None:
+        try:
+            await self._call(self.GroupManager.BanMember, user_id)
+            await self._call(self.GroupManager.UnbanMember, user_id)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error("Failed to remove user %s from the group: %s", user_id, e)
+            return
+
+        membership_mirror.record(user_id, False)
+        self.stats["kicked"] += 1
+
+    async def _worker(self) -> None:
+        """Process batches of queued users until cancelled."""
+        while True:
+            batch = await self._next_batch()
+            try:
+                members = await self._check_members(batch)
+                active = set(await MySQL.GetActiveSubscriptionUserIds(members, utcnow()))
+                self.stats["renewed"] += len(active)
+                for user_id in members:
+                    if user_id not in active:
+                        await self._kick(user_id)
+            except Exception as e:
+                self.stats["failed"] += len(batch)
+                logger.error("Failed to remove a batch of %d users from the group: %s", len(batch), e)
+            finally:
+                try:
+                    await membership_mirror.flush()
+                except Exception as e:
+                    logger.error("Failed to save the membership of a batch of users: %s", e)
+                for user_id in batch:
+                    self.pending.discard(user_id)
+                    self.queue.task_done()
+
+# Shared enforcement pipeline instance
+enforcement_pipeline = EnforcementPipeline(
+    concurrency=Config["enforcement_concurrency"],
+    rate=Config["enforcement_rate"]
+)
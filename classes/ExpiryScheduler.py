@@ -0,0 +1,150 @@
+"""
+ExpiryScheduler Class
+
+This module provides a deadline-driven scheduler for subscription expirations including:
+- Tracking active subscriptions ordered by expiration time
+- Sleeping until the next deadline is due
+- Rescheduling when subscriptions are changed or removed
+
+The scheduler keeps a min-heap of (expiration, user_id) entries and lazily discards
+entries that were superseded by a later schedule() or remove() call.
+"""
+
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+
+class ExpiryScheduler:
+    """
+    A min-heap of subscription deadlines that wakes only when one is due.
+
+    Attributes:
+        deadlines (dict): Current expiration timestamp for each scheduled user ID
+        heap (list): Heap of (expiration timestamp, user ID) entries, may contain stale entries
+    """
+
+    def __init__(self):
+        """Initialize an empty scheduler."""
+        self.deadlines = {}
+        self.heap = []
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def schedule(self, user_id: int | str, expiration_date: datetime | float | None) -> None:
+        """
+        Schedule (or reschedule) the expiration of a user's subscription.
+
+        Args:
+            user_id (int | str): The Telegram user ID
+            expiration_date (datetime | float | None): Expiration as a datetime (naive
+                datetimes are taken as UTC) or POSIX timestamp, None removes the user
+                from the scheduler
+        """
+        if expiration_date is None:
+            self.remove(user_id)
+            return
+
+        if isinstance(expiration_date, datetime):
+            if expiration_date.tzinfo is None:
+                expiration_date = expiration_date.replace(tzinfo=timezone.utc)
+            expiration_date = expiration_date.timestamp()
+
+        user_id = int(user_id)
+        expiration_date = float(expiration_date)
+        if self.deadlines.get(user_id) == expiration_date:
+            return
+
+        self.deadlines[user_id] = expiration_date
+        heapq.heappush(self.heap, (expiration_date, user_id))
+        self._changed.set()
+
+    def remove(self, user_id: int | str) -> None:
+        """
+        Remove a user from the scheduler.
+
+        Args:
+            user_id (int | str): The Telegram user ID
+        """
+        self.deadlines.pop(int(user_id), None)
+
+    def next_deadline(self) -> float | None:
+        """
+        Get the earliest pending expiration.
+
+        Returns:
+            float | None: POSIX timestamp of the next deadline, None if nothing is scheduled
+        """
+        self._discard_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now: float | None = None) -> list:
+        """
+        Remove and return every user whose deadline has passed.
+
+        Args:
+            now (float, optional): POSIX timestamp to compare against. Defaults to time.time()
+
+        Returns:
+            list: User IDs whose subscriptions are due for expiration
+        """
+        now = time.time() if now is None else now
+        due = []
+
+        self._discard_stale()
+        while self.heap and self.heap[0][0] <= now:
+            _, user_id = heapq.heappop(self.heap)
+            del self.deadlines[user_id]
+            due.append(user_id)
+            self._discard_stale()
+
+        return due
+
+    async def wait_due(self, timeout: float | None = None) -> list:
+        """
+        Sleep until at least one deadline is due or the timeout elapses.
+
+        The wait is restarted whenever schedule() adds an earlier deadline.
+
+        Args:
+            timeout (float, optional): Maximum number of seconds to wait. Defaults to no limit
+
+        Returns:
+            list: User IDs whose subscriptions are due, empty if the timeout elapsed first
+        """
+        loop = asyncio.get_running_loop()
+        give_up_at = None if timeout is None else loop.time() + timeout
+
+        while True:
+            due = self.pop_due()
+            if due:
+                return due
+
+            delays = []
+            next_deadline = self.next_deadline()
+            if next_deadline is not None:
+                delays.append(max(next_deadline - time.time(), 0))
+            if give_up_at is not None:
+                remaining = give_up_at - loop.time()
+                if remaining <= 0:
+                    return []
+                delays.append(remaining)
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(delays) if delays else None)
+            except TimeoutError:
+                pass
+
+    def _discard_stale(self) -> None:
+        """Drop heap entries that no longer match the user's current deadline."""
+        while self.heap:
+            expiration_date, user_id = self.heap[0]
+            if self.deadlines.get(user_id) == expiration_date:
+                return
+            heapq.heappop(self.heap)
+
+# Shared scheduler instance, kept current by database.MySQL.SetSubscription and DeleteExpiredSubscriptions
+expiry_scheduler = ExpiryScheduler()
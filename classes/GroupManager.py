@@ -6,10 +6,13 @@ This class provides core functionality for managing Telegram group operations in
 - Managing member access
 - Handling administrative actions
 
-The class interfaces directly with the Telegram Bot API to perform group management tasks.
+The class interfaces with the Telegram Bot API through the RequestScheduler to perform
+group management tasks.
 """
 
-from config import Config, bot
+from config import Config
+from classes.RequestScheduler import scheduler, Priority
+from classes.MembershipMirror import membership_mirror
 
 class GroupManager:
     """
@@ -20,11 +23,18 @@ class GroupManager:
 
     Attributes:
         chat_id (str): The Telegram chat ID of the managed group, loaded from config
+        priority (Priority): Priority class of the requests made by this instance
     """
 
-    def __init__(self):
-        """Initialize GroupManager with the configured group chat ID."""
+    def __init__(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Initialize GroupManager with the configured group chat ID.
+
+        Args:
+            priority (Priority, optional): Priority class of the requests. Defaults to INTERACTIVE
+        """
         self.chat_id = Config["GROUP_CHAT_ID"]
+        self.priority = priority
 
     async def CreateInviteLink(self, user_id: int | str) -> str:
         """
@@ -36,7 +46,9 @@ class GroupManager:
         Returns:
             str: The generated invite link URL
         """
-        InviteObj = await bot.create_chat_invite_link(
+        InviteObj = await scheduler.call(
+            "create_chat_invite_link",
+            self.priority,
             chat_id = self.chat_id,
             name = f"{user_id}",
             member_limit = 1
@@ -53,8 +65,26 @@ class GroupManager:
         Args:
             user_id (int | str): The Telegram user ID of the member to remove
         """
-        await bot.ban_chat_member(self.chat_id, user_id)
-        await bot.unban_chat_member(self.chat_id, user_id)
+        await self.BanMember(user_id)
+        await self.UnbanMember(user_id)
+
+    async def BanMember(self, user_id: int | str) -> None:
+        """
+        Ban a member from the group.
+
+        Args:
+            user_id (int | str): The Telegram user ID of the member to ban
+        """
+        await scheduler.call("ban_chat_member", self.priority, chat_id=self.chat_id, user_id=user_id)
+
+    async def UnbanMember(self, user_id: int | str) -> None:
+        """
+        Unban a user so they can join the group again.
+
+        Args:
+            user_id (int | str): The Telegram user ID of the user to unban
+        """
+        await scheduler.call("unban_chat_member", self.priority, chat_id=self.chat_id, user_id=user_id)
 
     async def isMemberInGroup(self, user_id: int | str) -> bool:
         """
@@ -64,10 +94,10 @@ class GroupManager:
             user_id (int | str): The Telegram user ID to check
 
         Returns:
-            bool: True if the user is a member, False otherwise
+            bool: True if the user is in the group (see MembershipMirror.is_chat_member), False otherwise
         """
-        inGroup = await bot.get_chat_member(self.chat_id, user_id)
-        return True if inGroup and inGroup.status == 'member' else False
+        chat_member = await scheduler.call("get_chat_member", self.priority, chat_id=self.chat_id, user_id=user_id)
+        return bool(chat_member) and membership_mirror.is_chat_member(chat_member)
     
     async def GetAdmins(self):
         """
@@ -76,5 +106,5 @@ class GroupManager:
         Returns:
             list: List of ChatMember objects representing group administrators
         """
-        admins = await bot.get_chat_administrators(self.chat_id)
+        admins = await scheduler.call("get_chat_administrators", self.priority, chat_id=self.chat_id)
         return admins
@@ -0,0 +1,152 @@
+"""
+LocaleCatalog Class
+
+This module provides the shared catalog of translations including:
+- Loading every locale file once, into shared read-only mappings
+- Per-key fallback to the default language
+- Reloading the files when they change, without a restart
+
+Every User reads its strings from the catalog, so a lookup is a dict access with no
+file I/O and no per-user copy of the translations.
+"""
+
+import asyncio
+import json
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from config import Config
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "locales")
+
+class LocaleView(Mapping):
+    """
+    Read-only view of one language in the catalog.
+
+    Keys missing from the language fall back to the default language, and the view
+    always reads the catalog's current strings, so it stays valid across reloads.
+
+    Attributes:
+        catalog (LocaleCatalog): The catalog the strings are read from
+        lang (str): The language code of the view
+    """
+
+    def __init__(self, catalog, lang: str):
+        self.catalog = catalog
+        self.lang = lang
+
+    def __getitem__(self, key: str) -> str:
+        strings = self.catalog.locales.get(self.lang)
+        if strings is not None and key in strings:
+            return strings[key]
+        return self.catalog.locales[self.catalog.default_language][key]
+
+    def __iter__(self):
+        strings = self.catalog.locales.get(self.lang, {})
+        default_strings = self.catalog.locales[self.catalog.default_language]
+        yield from strings
+        yield from (key for key in default_strings if key not in strings)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+class LocaleCatalog:
+    """
+    The translations of every supported language.
+
+    Attributes:
+        directory (str): Directory containing the <lang>.json files
+        default_language (str): Language used when a language or key is missing
+        locales (dict): Read-only mapping of strings for each language code
+        version (int): Incremented on every (re)load, usable as a cache key
+    """
+
+    def __init__(self, directory: str, default_language: str):
+        """
+        Initialize the catalog and load every locale file.
+
+        Args:
+            directory (str): Directory containing the <lang>.json files
+            default_language (str): Language used when a language or key is missing
+        """
+        self.directory = directory
+        self.default_language = default_language
+        self.locales = {}
+        self.version = 0
+        self._mtimes = {}
+        self._views = {}
+        self.load()
+
+    def _scan(self) -> dict:
+        """Get the modification time of every locale file."""
+        return {
+            entry.name[:-len(".json")]: entry.stat().st_mtime
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".json")
+        }
+
+    def load(self) -> None:
+        """Load every locale file and swap them in at once."""
+        mtimes = self._scan()
+        locales = {}
+
+        for lang in mtimes:
+            with open(os.path.join(self.directory, f"{lang}.json"), "r", encoding="utf-8") as f:
+                locales[lang] = MappingProxyType(json.load(f))
+
+        self.locales = locales
+        self._mtimes = mtimes
+        self.version += 1
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the locale files if any of them was added, removed or modified.
+
+        Returns:
+            bool: True if the catalog was reloaded, False otherwise
+        """
+        if self._scan() == self._mtimes:
+            return False
+
+        self.load()
+        return True
+
+    def get(self, lang: str | None) -> LocaleView:
+        """
+        Get the strings of a language.
+
+        Args:
+            lang (str | None): Language code, unknown languages use the default language
+
+        Returns:
+            LocaleView: Read-only view of the language's strings
+        """
+        if lang not in self.locales:
+            lang = self.default_language
+
+        view = self._views.get(lang)
+        if view is None:
+            view = self._views[lang] = LocaleView(self, lang)
+        return view
+
+    async def watch(self, interval: float) -> None:
+        """
+        Reload the catalog whenever the locale files change.
+
+        Args:
+            interval (float): Number of seconds between two checks
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    logger.info("Locales reloaded.")
+            except Exception as e:
+                logger.error("Error while reloading the locales: %s", e)
+
+# Shared locale catalog instance
+locale_catalog = LocaleCatalog(LOCALES_DIR, Config["DEFAULT_LANGUAGE"])
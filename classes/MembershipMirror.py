@@ -0,0 +1,139 @@
+"""
+MembershipMirror Class
+
+This module provides a local mirror of the group membership including:
+- An in-memory map of known membership states, keyed by user ID
+- Persistence of the states in the users.inGroup column
+- Buffered writes, flushed with one UPDATE per state
+- Updates from chat_member events (joins, leaves and kicks)
+- Reloading states recorded by other bot processes
+
+Enforcement reads membership from the mirror and only asks Telegram (getChatMember)
+for users whose state is not known yet.
+"""
+
+from database import MySQL
+
+class MembershipMirror:
+    """
+    A local mirror of who is in the group.
+
+    Attributes:
+        states (dict): Known membership state (True if in the group) for each user ID
+        unsaved (dict): States recorded with record() and not written to the database yet
+    """
+
+    def __init__(self):
+        """Initialize an empty mirror."""
+        self.states = {}
+        self.unsaved = {}
+
+    @staticmethod
+    def is_chat_member(chat_member) -> bool:
+        """
+        Check if a ChatMember object describes someone who is in the chat.
+
+        Args:
+            chat_member: ChatMember object from a chat_member update or getChatMember
+
+        Returns:
+            bool: True if the user is in the chat, False otherwise
+        """
+        if chat_member.status in ('member', 'administrator', 'creator'):
+            return True
+        return chat_member.status == 'restricted' and bool(getattr(chat_member, 'is_member', False))
+
+    async def load(self) -> None:
+        """
+        Load the users marked as in the group from the database.
+
+        Only members are loaded: users marked as not in the group may simply never
+        have been observed, so their state is left unknown and checked with Telegram.
+        States already set by chat_member events are kept.
+        """
+        for user_id in await MySQL.GetGroupMemberIds():
+            self.states.setdefault(user_id, True)
+
+    async def refresh(self, user_ids: list) -> None:
+        """
+        Reload the states of some users from the database.
+
+        With several bot processes, chat_member events reach whichever process
+        received the update, which records them in the database. The owner of
+        the users' shard reloads them before acting on them: users marked as in
+        the group are members, and members no longer marked as in the group
+        become unknown, so they are checked with Telegram.
+
+        Args:
+            user_ids (list): Telegram user IDs
+        """
+        if not user_ids:
+            return
+
+        members = set(await MySQL.GetGroupMemberIds(user_ids))
+        for user_id in map(int, user_ids):
+            if user_id in members:
+                self.states[user_id] = True
+            elif self.states.get(user_id):
+                del self.states[user_id]
+
+    def get(self, user_id: int) -> bool | None:
+        """
+        Get the mirrored membership state of a user.
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            bool | None: True if the user is in the group, False if not, None if unknown
+        """
+        return self.states.get(int(user_id))
+
+    async def set_member(self, user_id: int, inGroup: bool) -> None:
+        """
+        Record the membership state of a user, in memory and in the database.
+
+        Args:
+            user_id (int): Telegram user ID
+            inGroup (bool): Whether the user is in the group
+        """
+        user_id = int(user_id)
+        if self.states.get(user_id) == inGroup:
+            return
+
+        self.states[user_id] = inGroup
+        self.unsaved.pop(user_id, None)
+        await MySQL.UpdateFieldForUser(user_id, "inGroup", inGroup)
+
+    def record(self, user_id: int, inGroup: bool) -> None:
+        """
+        Record the membership state of a user in memory, it is written to the database by flush().
+
+        Args:
+            user_id (int): Telegram user ID
+            inGroup (bool): Whether the user is in the group
+        """
+        user_id = int(user_id)
+        if self.states.get(user_id) == inGroup:
+            return
+
+        self.states[user_id] = inGroup
+        self.unsaved[user_id] = inGroup
+
+    async def flush(self) -> None:
+        """Write the states recorded with record() to the database, with one UPDATE per state."""
+        unsaved, self.unsaved = self.unsaved, {}
+        try:
+            for inGroup in (True, False):
+                user_ids = [user_id for user_id, state in unsaved.items() if state == inGroup]
+                await MySQL.SetUsersInGroup(user_ids, inGroup)
+                for user_id in user_ids:
+                    del unsaved[user_id]
+        finally:
+            # Keep the states not written for the next flush, unless they changed since
+            for user_id, inGroup in unsaved.items():
+                if self.states.get(user_id) == inGroup:
+                    self.unsaved.setdefault(user_id, inGroup)
+
+# Shared membership mirror instance, kept current by chat_member updates
+membership_mirror = MembershipMirror()
@@ -0,0 +1,309 @@
+"""
+Metrics Class
+
+This module provides the in-process metrics registry served on /metrics including:
+- Counters, gauges and histograms with labels
+- Metrics read from existing counters when scraped (e.g. the scheduler's call counts)
+- Timing of coroutine functions and of the bot's update handlers
+- The Prometheus text exposition format
+- A small HTTP server exposing /metrics from processes that don't run the API app
+
+The registry only keeps a few numbers per label set, so recording a sample costs
+a dictionary lookup and does not slow down the code being measured.
+"""
+
+import bisect
+import functools
+import hmac
+import math
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """
+    Base class of the metric families.
+
+    Attributes:
+        name (str): Name of the metric
+        help (str): Description of the metric
+        labels (tuple): Names of the labels
+        collect (Callable, optional): Function returning the values when scraped, instead of
+            the recorded ones: a number, or a dict keyed by label value (or tuple of label values)
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), collect: Optional[Callable] = None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+        self.values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def _collected(self) -> dict:
+        values = self.collect()
+        if not isinstance(values, dict):
+            return {(): values}
+        return {key if isinstance(key, tuple) else (key,): value for key, value in values.items()}
+
+    def samples(self) -> list:
+        """
+        Get the samples of the metric.
+
+        Returns:
+            list: (name, label names, label values, value) tuples
+        """
+        values = self._collected() if self.collect else dict(self.values)
+        return [
+            (self.name, self.labels, key, value)
+            for key, value in sorted(values.items(), key=lambda item: tuple(map(str, item[0])))
+            if value is not None
+        ]
+
+class Counter(Metric):
+    """A value that only goes up, e.g. a number of calls."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. a queue depth."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self.values[self._key(labels)] = value
+
+class Timer:
+    """Context manager observing its duration on a histogram."""
+
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+class Histogram(Metric):
+    """
+    A distribution of values, e.g. durations, counted in buckets.
+
+    Attributes:
+        buckets (tuple): Upper bounds of the buckets, in increasing order
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            # Count per bucket (the last one is +Inf), then the sum of the values
+            state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, **labels) -> Timer:
+        """
+        Time a block of code.
+
+        Example:
+            >>> with histogram.time(function="GetUser"):
+            ...     await MySQL.GetUser(user_id)
+        """
+        return Timer(self, labels)
+
+    def samples(self) -> list:
+        samples = []
+        for key, (counts, total) in sorted(self.values.items(), key=lambda item: tuple(map(str, item[0]))):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((self.name + "_bucket", self.labels, key, cumulative, f'le="{_format_value(bound)}"'))
+            samples.append((self.name + "_sum", self.labels, key, total))
+            samples.append((self.name + "_count", self.labels, key, cumulative))
+        return samples
+
+class MetricsRegistry:
+    """
+    The metrics of the process.
+
+    Attributes:
+        prefix (str): Prefix of every metric name
+        metrics (dict): The registered metrics, keyed by name
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        self.metrics = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = (), collect: Optional[Callable] = None) -> Counter:
+        return self._register(Counter(self.prefix + name, help, labels, collect))
+
+    def gauge(self, name: str, help: str, labels: tuple = (), collect: Optional[Callable] = None) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, one sample per line
+        """
+        lines = []
+        for metric in self.metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                lines.append(f"# {metric.name} could not be collected: {e}")
+                continue
+
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, label_names, label_values, value, *extra in samples:
+                lines.append(f"{name}{_format_labels(label_names, label_values, *extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def instrument(func: Callable, histogram: Histogram, errors: Optional[Counter] = None, **labels) -> Callable:
+    """
+    Wrap a coroutine function so its calls are timed on a histogram.
+
+    The wrapper keeps the signature of the function, which telebot inspects
+    to decide which arguments to pass to a handler.
+
+    Args:
+        func (Callable): The coroutine function
+        histogram (Histogram): Histogram observing the duration of every call
+        errors (Counter, optional): Counter of the calls raising an exception
+        **labels: Labels of the samples
+
+    Returns:
+        Callable: The wrapped coroutine function
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            if errors is not None:
+                errors.inc(**labels)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started, **labels)
+
+    return wrapper
+
+def instrument_handlers(bot, update_types: list) -> None:
+    """
+    Time the registered handlers of the bot, labelled by handler function name.
+
+    Args:
+        bot (AsyncTeleBot): The bot, after its handlers are registered
+        update_types (list): Update types whose handlers are timed, e.g. ["message"]
+    """
+    for update_type in update_types:
+        for handler in getattr(bot, f"{update_type}_handlers"):
+            func = handler["function"]
+            if getattr(func, "__instrumented__", False):
+                continue
+            handler["function"] = instrument(
+                func, handler_duration, handler_errors, handler=func.__name__, update_type=update_type
+            )
+            handler["function"].__instrumented__ = True
+
+def is_authorized(authorization: Optional[str], token: str) -> bool:
+    """
+    Check the Authorization header of a /metrics request.
+
+    Args:
+        authorization (str, optional): The Authorization header, "Bearer <token>"
+        token (str): The required token, empty to allow every request
+
+    Returns:
+        bool: True if the metrics may be read
+    """
+    return not token or hmac.compare_digest(authorization or "", f"Bearer {token}")
+
+async def serve_metrics(registry: "MetricsRegistry", host: str, port: int, token: str = "") -> web.AppRunner:
+    """
+    Serve the metrics of a registry on /metrics, in the background of the running event loop.
+
+    Args:
+        registry (MetricsRegistry): The metrics served
+        host (str): The address to listen on
+        port (int): The port to listen on
+        token (str, optional): The bearer token required to read the metrics, empty for none
+
+    Returns:
+        web.AppRunner: The running server, stopped with its cleanup() method
+    """
+    async def handle(request: web.Request) -> web.Response:
+        if not is_authorized(request.headers.get("Authorization"), token):
+            raise web.HTTPUnauthorized(text="Invalid metrics token")
+        return web.Response(text=registry.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+# Shared metrics registry instance
+metrics = MetricsRegistry(prefix="groupmanager_")
+
+handler_duration = metrics.histogram(
+    "handler_duration_seconds", "Duration of the update handlers", labels=("handler", "update_type")
+)
+handler_errors = metrics.counter(
+    "handler_errors_total", "Update handlers raising an exception", labels=("handler", "update_type")
+)
@@ -0,0 +1,185 @@
+"""
+PaymentQueue Class
+
+This module provides the worker pool that processes completed payments including:
+- A queue of CoinPayments transaction IDs, each queued at most once at a time
+- A fixed number of workers granting the subscriptions and notifying the users
+- A periodic sweep re-queueing completed payments that were never applied or whose
+  buyer was never notified
+- Progress counters and the time from notification to subscription, served on /metrics
+
+The IPN endpoint only verifies, records and queues a notification, so CoinPayments
+gets its answer without waiting for the database writes or the Telegram calls.
+
+Payments are applied with MySQL.ApplyPayment, which grants a subscription at most
+once per txn_id, so IPN retries, duplicate deliveries and sweeps are all harmless.
+The buyer's notification is recorded separately with MySQL.MarkPaymentNotified once
+it was sent, so a failed send is retried by the sweep without granting twice.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from datetime import timedelta
+
+from config import Config
+from database import MySQL
+from utils.logger import get_logger
+from utils.user import GetUser
+from utils.utils import utcnow
+from telebot.util import quick_markup
+from classes.GroupManager import GroupManager as GM
+from classes.Metrics import metrics
+
+logger = get_logger(__name__)
+
+class PaymentQueue:
+    """
+    A worker pool granting the subscriptions of completed payments.
+
+    Attributes:
+        concurrency (int): Number of workers processing the queue
+        stats (Counter): Progress counters (queued, applied, notified, duplicate, failed)
+    """
+
+    def __init__(self, concurrency: int):
+        """
+        Initialize the queue, the workers are started by start().
+
+        Args:
+            concurrency (int): Number of workers processing the queue
+        """
+        self.concurrency = concurrency
+        self.stats = Counter()
+        self.pending = {}
+        self.queue = None
+        self.workers = []
+        self.GroupManager = GM()
+
+    def start(self) -> None:
+        """Start the workers if they are not running yet."""
+        if self.workers:
+            return
+
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Cancel the workers, payments left in the queue are picked up again by the next sweep."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.pending.clear()
+
+    def submit(self, txn_id: str) -> None:
+        """
+        Queue a completed payment. Transactions already queued are skipped.
+
+        Args:
+            txn_id (str): CoinPayments transaction ID
+        """
+        self.start()
+        if txn_id in self.pending:
+            return
+
+        self.pending[txn_id] = time.perf_counter()
+        self.stats["queued"] += 1
+        self.queue.put_nowait(txn_id)
+
+    async def recover(self, grace: float = 0) -> int:
+        """
+        Queue every completed payment whose subscription wasn't granted or whose buyer wasn't notified yet.
+
+        Args:
+            grace (float, optional): Number of seconds a granted payment is left to its worker
+                before its notification is retried. Defaults to 0
+
+        Returns:
+            int: The number of payments found
+        """
+        txn_ids = await MySQL.GetUnfinishedPayments(utcnow() - timedelta(seconds=grace))
+        for txn_id in txn_ids:
+            self.submit(txn_id)
+        return len(txn_ids)
+
+    async def sweep(self, interval: float) -> None:
+        """
+        Recover unfinished payments forever.
+
+        Args:
+            interval (float): Number of seconds between two sweeps
+        """
+        while True:
+            try:
+                recovered = await self.recover(grace=interval)
+                if recovered:
+                    logger.info("Queued %d unfinished payments.", recovered)
+            except Exception as e:
+                logger.error("Error while recovering unfinished payments: %s", e)
+            await asyncio.sleep(interval)
+
+    async def _apply(self, txn_id: str) -> None:
+        """Grant the subscription of a payment and send the invite link to its buyer, unless they already got it."""
+        expiration_date = utcnow() + timedelta(days=Config["subscription_days"])
+        user_id = await MySQL.ApplyPayment(
+            txn_id,
+            expiration_date,
+            plan=f"{Config['subscription_days']}d",
+            source="coinpayments"
+        )
+        if user_id is None:
+            # Already granted, only the notification may be left
+            payment = await MySQL.GetPaymentByTxnId(txn_id)
+            if payment is None or payment.applied_at is None or payment.notified_at is not None:
+                self.stats["duplicate"] += 1
+                return
+            user_id = payment.user_id
+        else:
+            self.stats["applied"] += 1
+
+        User = await GetUser(user_id)
+
+        # Generate group invite link and send to user
+        invite_link = await self.GroupManager.CreateInviteLink(user_id)
+        markup = quick_markup({
+            User.locales['joinGroup']: {'url': invite_link},
+        }, row_width=1)
+
+        # Send confirmation message to user
+        await User.SendMessage(
+            User.locales['subscription:started'].format(days=Config["subscription_days"]),
+            reply_markup=markup,
+            protect_content=True
+        )
+        await MySQL.MarkPaymentNotified(txn_id)
+        self.stats["notified"] += 1
+
+    async def _worker(self) -> None:
+        """Process queued payments until cancelled."""
+        while True:
+            txn_id = await self.queue.get()
+            try:
+                await self._apply(txn_id)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error("Failed to apply payment %s: %s", txn_id, e)
+            finally:
+                payment_latency.observe(time.perf_counter() - self.pending.pop(txn_id))
+                self.queue.task_done()
+
+# Shared payment queue instance
+payment_queue = PaymentQueue(concurrency=Config["ipn_workers"])
+
+payment_latency = metrics.histogram(
+    "payment_latency_seconds", "Time from queueing a completed payment to processing it",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+metrics.gauge(
+    "payment_queue_depth", "Completed payments waiting to be applied",
+    collect=lambda: len(payment_queue.pending)
+)
+metrics.counter(
+    "payments_total", "Progress of the payment queue", labels=("result",),
+    collect=lambda: payment_queue.stats
+)
@@ -0,0 +1,114 @@
+"""
+RateQuotes Class
+
+This module provides cached exchange-rate quotes for the supported coins including:
+- A background refresher pulling CoinPayments rates on an interval
+- An in-memory table of the subscription price in each coin
+- A time-to-live after which quotes are no longer shown
+
+The coin selection screen reads the quotes from memory, so users can compare
+prices without any external call per click.
+"""
+
+import asyncio
+import time
+
+from config import Config
+from utils.logger import get_logger
+from classes.CoinPayments import coinpayments
+
+logger = get_logger(__name__)
+
+class RateQuotes:
+    """
+    Cached subscription prices in each supported coin.
+
+    Attributes:
+        client (CoinPaymentsClient): The client used to fetch the rates
+        coins (list): The supported coins, as in Config["coins"]
+        ttl (float): Number of seconds the quotes stay valid after a refresh
+        prices (dict): Subscription price in each coin, keyed by coin_ref
+        version (int): Incremented on every successful refresh, usable as a cache key
+    """
+
+    def __init__(self, client, coins: list, ttl: float):
+        """
+        Initialize an empty quote table.
+
+        Args:
+            client (CoinPaymentsClient): The client used to fetch the rates
+            coins (list): The supported coins, as in Config["coins"]
+            ttl (float): Number of seconds the quotes stay valid after a refresh
+        """
+        self.client = client
+        self.coins = coins
+        self.ttl = ttl
+        self.prices = {}
+        self.version = 0
+        self.refreshed_at = 0.0
+
+    def is_fresh(self) -> bool:
+        """Whether the quotes were refreshed less than ttl seconds ago."""
+        return bool(self.prices) and time.monotonic() - self.refreshed_at < self.ttl
+
+    def current_version(self) -> int | None:
+        """
+        Get the version of the quotes currently shown.
+
+        Returns:
+            int | None: The refresh version, None if the quotes expired
+        """
+        return self.version if self.is_fresh() else None
+
+    def quote(self, coin_ref: str) -> float | None:
+        """
+        Get the subscription price in a coin.
+
+        Args:
+            coin_ref (str): The coin_ref of the coin
+
+        Returns:
+            float | None: The price in the coin's units, None if unknown or expired
+        """
+        return self.prices.get(coin_ref) if self.is_fresh() else None
+
+    async def refresh(self) -> bool:
+        """
+        Fetch the rates of the supported coins and update the quotes.
+
+        Returns:
+            bool: True if the quotes were updated, False if the rates couldn't be fetched
+        """
+        rates = await self.client.call("rates", short=1)
+        if not rates or "USD" not in rates:
+            return False
+
+        usd_rate = float(rates["USD"]["rate_btc"])
+        prices = {}
+        for coin in self.coins:
+            rate = rates.get(coin["coin_ref"])
+            if rate and float(rate["rate_btc"]) > 0:
+                prices[coin["coin_ref"]] = Config["subscription_price"] * usd_rate / float(rate["rate_btc"])
+
+        self.prices = prices
+        self.refreshed_at = time.monotonic()
+        self.version += 1
+        return True
+
+    async def watch(self, interval: float) -> None:
+        """
+        Refresh the quotes forever.
+
+        Args:
+            interval (float): Number of seconds between two refreshes
+        """
+        while True:
+            try:
+                if not await self.refresh():
+                    logger.warning("Could not refresh the exchange rates.")
+            except Exception as e:
+                logger.error("Error while refreshing the exchange rates: %s", e)
+            await asyncio.sleep(interval)
+
+# Shared quote table instance
+rate_quotes = RateQuotes(coinpayments, Config["coins"], ttl=Config["rates_ttl"])
@@ -0,0 +1,229 @@
+"""
+RequestScheduler Class
+
+This module provides the scheduler every outbound Bot API call goes through including:
+- Priority classes, so interactive replies go ahead of background work
+- A global token bucket matching Telegram's overall sending limit
+- Per-chat token buckets for message sending methods
+- Retries that honour Telegram's retry_after on 429 errors
+- Queue-depth, per-method call and latency metrics (also served on /metrics)
+
+Requests wait for a global token in priority order, so a backlog of background
+kicks or broadcasts never delays a reply to a user by more than one token.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from enum import IntEnum
+
+from config import Config, bot
+from utils.logger import get_logger
+from utils.utils import get_retry_after
+from classes.TokenBucket import TokenBucket
+from classes.Metrics import metrics
+
+logger = get_logger(__name__)
+
+class Priority(IntEnum):
+    """
+    Priority classes of outbound requests, lower values are sent first.
+
+    - INTERACTIVE: Replies to a user's message or button press
+    - BACKGROUND: Membership checks, kicks and broadcasts
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+# Methods that send or edit a message and count towards the per-chat limits
+MESSAGE_METHODS = {
+    "send_message",
+    "send_photo",
+    "edit_message_text",
+    "edit_message_caption",
+    "edit_message_reply_markup",
+}
+
+class RequestScheduler:
+    """
+    Schedules outbound Bot API calls by priority and rate limits.
+
+    Attributes:
+        bot (AsyncTeleBot): The bot instance used to make the calls
+        global_bucket (TokenBucket): Bucket shared by every request
+        chat_buckets (dict): Per-chat buckets for message sending methods, keyed by chat ID
+        max_retries (int): Number of times a request is retried after a 429 error
+        calls (Counter): Number of calls made per method
+        errors (Counter): Number of failed calls per method
+    """
+
+    def __init__(self, bot, global_rate: float, chat_rate: float, group_rate: float, max_retries: int):
+        """
+        Initialize the scheduler, the dispatcher is started on the first call.
+
+        Args:
+            bot (AsyncTeleBot): The bot instance used to make the calls
+            global_rate (float): Maximum number of requests per second overall
+            chat_rate (float): Maximum number of messages per second in a private chat
+            group_rate (float): Maximum number of messages per second in a group
+            max_retries (int): Number of times a request is retried after a 429 error
+        """
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_buckets = {}
+        self.max_retries = max_retries
+        self.calls = Counter()
+        self.errors = Counter()
+        self.retries = 0
+        self.waiting = []
+        self.depth = Counter()
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._dispatcher = None
+
+    async def call(self, method: str, priority: Priority = Priority.INTERACTIVE, **kwargs):
+        """
+        Make a Bot API call once the rate limits allow it.
+
+        Args:
+            method (str): Name of the AsyncTeleBot method to call, e.g. "send_message"
+            priority (Priority, optional): Priority class of the request. Defaults to INTERACTIVE
+            **kwargs: Keyword arguments for the method
+
+        Returns:
+            Any: The result of the call
+
+        Raises:
+            ApiTelegramException: If Telegram rejects the request, or keeps answering
+                with 429 after max_retries retries
+        """
+        chat_bucket = self._chat_bucket(kwargs.get("chat_id")) if method in MESSAGE_METHODS else None
+
+        for attempt in range(self.max_retries + 1):
+            with telegram_wait.time(priority=priority.name.lower()):
+                if chat_bucket:
+                    await chat_bucket.acquire()
+                await self._acquire_global(priority)
+
+            self.calls[method] += 1
+            try:
+                with telegram_duration.time(method=method):
+                    return await getattr(self.bot, method)(**kwargs)
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    self.errors[method] += 1
+                    raise
+
+                self.retries += 1
+                logger.warning("Telegram asked to retry %s after %ss.", method, retry_after)
+                # Without a chat bucket the limit isn't tied to one chat, so every request waits
+                if chat_bucket:
+                    chat_bucket.pause(retry_after)
+                else:
+                    self.global_bucket.pause(retry_after)
+
+    def stats(self) -> dict:
+        """
+        Get the scheduler metrics.
+
+        Returns:
+            dict: Queue depth per priority, calls and errors per method, and the number of retries
+        """
+        return {
+            "queue_depth": {priority.name.lower(): self.depth[priority] for priority in Priority},
+            "calls": dict(self.calls),
+            "errors": dict(self.errors),
+            "retries": self.retries,
+        }
+
+    def _chat_bucket(self, chat_id) -> TokenBucket | None:
+        """Get (or create) the token bucket of a chat."""
+        if chat_id is None:
+            return None
+
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= 10000:
+                self._prune_chat_buckets()
+
+            rate = self.group_rate if int(chat_id) < 0 else self.chat_rate
+            bucket = self.chat_buckets[chat_id] = TokenBucket(rate, capacity=1)
+
+        return bucket
+
+    def _prune_chat_buckets(self) -> None:
+        """Drop the buckets of chats that have been idle long enough to be full again."""
+        now = time.monotonic()
+        self.chat_buckets = {
+            chat_id: bucket for chat_id, bucket in self.chat_buckets.items()
+            if now - bucket.updated_at < bucket.capacity / bucket.rate
+        }
+
+    async def _acquire_global(self, priority: Priority) -> None:
+        """Wait for a global token, served in priority order."""
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (priority, next(self._sequence), future))
+        self.depth[priority] += 1
+        self._wakeup.set()
+
+        try:
+            await future
+        finally:
+            self.depth[priority] -= 1
+
+    async def _dispatch(self) -> None:
+        """Hand out global tokens to the waiting requests, highest priority first."""
+        while True:
+            while not self.waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            await self.global_bucket.acquire()
+
+            # Skip requests whose caller was cancelled while waiting
+            while self.waiting:
+                _, _, future = heapq.heappop(self.waiting)
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+# Shared scheduler instance, used for every outbound Bot API call
+scheduler = RequestScheduler(
+    bot,
+    global_rate=Config["telegram_global_rate"],
+    chat_rate=Config["telegram_chat_rate"],
+    group_rate=Config["telegram_group_rate"],
+    max_retries=Config["telegram_max_retries"]
+)
+
+telegram_duration = metrics.histogram(
+    "telegram_request_duration_seconds", "Duration of the Bot API calls, once sent", labels=("method",)
+)
+telegram_wait = metrics.histogram(
+    "telegram_wait_seconds", "Time the Bot API calls waited for the rate limits", labels=("priority",)
+)
+metrics.counter(
+    "telegram_requests_total", "Bot API calls sent, retries included", labels=("method",),
+    collect=lambda: scheduler.calls
+)
+metrics.counter(
+    "telegram_errors_total", "Bot API calls that failed", labels=("method",),
+    collect=lambda: scheduler.errors
+)
+metrics.counter(
+    "telegram_retries_total", "Bot API calls retried after a 429 error",
+    collect=lambda: scheduler.retries
+)
+metrics.gauge(
+    "telegram_queue_depth", "Bot API calls waiting for the rate limits", labels=("priority",),
+    collect=lambda: {priority.name.lower(): scheduler.depth[priority] for priority in Priority}
+)
@@ -0,0 +1,115 @@
+"""
+ScreenCache Class
+
+This module provides the render cache for the bot's static screens including:
+- Reply keyboards built once per locale and shared between users
+- An index of the configured coins by coin_ref
+- Rebuilding the keyboards when the locale catalog is reloaded or the rate quotes change
+
+Keyboards only depend on the locale, the config and the rate quotes, so the handlers serve the
+cached objects instead of rebuilding them on every callback.
+"""
+
+from telebot.util import quick_markup
+
+from config import Config
+from classes.LocaleCatalog import locale_catalog
+from classes.RateQuotes import rate_quotes
+
+class ScreenCache:
+    """
+    Per-locale cache of the static keyboards.
+
+    Attributes:
+        catalog (LocaleCatalog): The catalog the button labels are read from
+        quotes (RateQuotes): The subscription prices shown on the coin buttons
+        coins_by_ref (dict): The configured coins, keyed by coin_ref
+        markups (dict): Cached keyboards, keyed by (screen name, language code, variant)
+    """
+
+    def __init__(self, catalog, quotes, coins: list):
+        """
+        Initialize the cache.
+
+        Args:
+            catalog (LocaleCatalog): The catalog the button labels are read from
+            quotes (RateQuotes): The subscription prices shown on the coin buttons
+            coins (list): The supported coins, as in Config["coins"]
+        """
+        self.catalog = catalog
+        self.quotes = quotes
+        self.coins = coins
+        self.coins_by_ref = {coin["coin_ref"]: coin for coin in coins}
+        self.markups = {}
+        self._version = None
+        self._quotes_version = None
+
+    def _get(self, name: str, locales, build, variant=None):
+        """Get a cached keyboard, building it on the first use or after a locale reload."""
+        if self._version != self.catalog.version:
+            self.markups = {}
+            self._version = self.catalog.version
+
+        key = (name, locales.lang, variant)
+        markup = self.markups.get(key)
+        if markup is None:
+            markup = self.markups[key] = build(locales)
+        return markup
+
+    def warm(self) -> None:
+        """Build every keyboard for every loaded language."""
+        for lang in self.catalog.locales:
+            locales = self.catalog.get(lang)
+            self.start_no_subscription(locales)
+            self.buy_membership(locales)
+            self.show_coins(locales)
+            self.back_to_coins(locales)
+
+    def start_no_subscription(self, locales):
+        """Keyboard of the /start screen for users without a subscription."""
+        return self._get("start_no_subscription", locales, lambda locales: quick_markup({
+            locales['start:buyMembership']: {'callback_data': 'buyMembership'},
+            locales['start:support']: {'callback_data': 'support'}
+        }, row_width=1))
+
+    def buy_membership(self, locales):
+        """Keyboard listing the payment methods."""
+        return self._get("buy_membership", locales, lambda locales: quick_markup({
+            locales['membership:buying:buyWithCrypto']: {'callback_data': 'buyMembership:showCoins'},
+            locales['back']: {'callback_data': 'start'}
+        }, row_width=1))
+
+    def coin_label(self, coin: dict) -> str:
+        """Button label of a coin, with the subscription price in that coin if it is known."""
+        label = f"{coin['name']} - {coin['network']}"
+        price = self.quotes.quote(coin['coin_ref'])
+        if price is None:
+            return label
+
+        amount = f"{price:.8f}".rstrip("0").rstrip(".")
+        return f"{label} (≈ {amount} {coin['name']})"
+
+    def show_coins(self, locales):
+        """Keyboard listing the supported coins, with their current price."""
+        variant = self.quotes.current_version()
+        if variant != self._quotes_version:
+            # Keyboards built for previous quotes are never served again, drop them
+            self.markups = {key: markup for key, markup in self.markups.items() if key[0] != "show_coins"}
+            self._quotes_version = variant
+
+        return self._get("show_coins", locales, lambda locales: quick_markup({
+            **{
+                self.coin_label(coin): {'callback_data': f"pay_membership:checkPoint {coin['coin_ref']}"}
+                for coin in self.coins
+            },
+            locales['back']: {'callback_data': 'buyMembership'}
+        }, row_width=1), variant)
+
+    def back_to_coins(self, locales):
+        """Keyboard with a single button going back to the coin list."""
+        return self._get("back_to_coins", locales, lambda locales: quick_markup({
+            locales['back']: {'callback_data': 'buyMembership:showCoins'}
+        }, row_width=1))
+
+# Shared screen cache instance
+screen_cache = ScreenCache(locale_catalog, rate_quotes, Config["coins"])
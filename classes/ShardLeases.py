@@ -0,0 +1,150 @@
+"""
+ShardLeases Class
+
+This module coordinates the members checker between bot processes including:
+- Splitting the user ID space into shards (user_id % shards)
+- Claiming shards with leases in the database, so each shard has one owner
+- Balancing the shards between the live processes
+- Renewing the leases in the background and giving up shards whose lease lapsed
+
+With a single shard this is a leader election: one process runs the checker and
+the others take over when its lease expires. With more shards, every process
+checks and removes the users of its own shards, so each expired user is handled
+by exactly one process and the work is spread as processes are added.
+"""
+
+import asyncio
+import math
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from config import Config
+from database import MySQL
+from utils.logger import get_logger
+from utils.utils import utcnow
+
+logger = get_logger(__name__)
+
+NODE_PREFIX = "checker:node:"
+SHARD_PREFIX = "checker:shard:"
+
+class ShardLeases:
+    """
+    The shards of the members checker owned by this process.
+
+    Attributes:
+        shards (int): Number of shards the user ID space is split into
+        ttl (float): Number of seconds a lease lasts without renewal
+        owner (str): Identifier of this process in the leases table
+        owned (frozenset): Shard numbers owned by this process
+    """
+
+    def __init__(self, shards: int, ttl: float):
+        """
+        Initialize the leases, no shard is owned until the first renew().
+
+        Args:
+            shards (int): Number of shards the user ID space is split into
+            ttl (float): Number of seconds a lease lasts without renewal
+        """
+        self.shards = shards
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.owned = frozenset()
+        self.valid_until = 0.0
+
+    def owns(self, user_id: int) -> bool:
+        """
+        Whether the user belongs to a shard owned by this process.
+
+        Leases are only trusted until they could have expired, so a process
+        that can't renew them stops working on its shards in time.
+
+        Args:
+            user_id (int): Telegram user ID
+
+        Returns:
+            bool: True if this process is responsible for the user
+        """
+        if time.monotonic() >= self.valid_until:
+            return False
+        return int(user_id) % self.shards in self.owned
+
+    async def renew(self) -> frozenset:
+        """
+        Renew the owned leases and rebalance the shards between the live processes.
+
+        Every process announces itself with a node lease, then keeps at most its
+        fair share of the shards (releasing the extra ones for newcomers) and
+        claims free shards up to that share.
+
+        Returns:
+            frozenset: The shard numbers owned after the renewal
+        """
+        started = time.monotonic()
+        now = utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+
+        await MySQL.AcquireLease(f"{NODE_PREFIX}{self.owner}", self.owner, expires_at, now)
+        await MySQL.DeleteExpiredLeases(NODE_PREFIX, now)
+        nodes = await MySQL.GetLeases(NODE_PREFIX, now)
+        share = math.ceil(self.shards / max(len(nodes), 1))
+
+        leases = await MySQL.GetLeases(SHARD_PREFIX, now)
+        mine = sorted(
+            int(name[len(SHARD_PREFIX):]) for name, owner in leases.items()
+            if owner == self.owner and int(name[len(SHARD_PREFIX):]) < self.shards
+        )
+        free = [
+            shard for shard in range(self.shards)
+            if f"{SHARD_PREFIX}{shard}" not in leases
+        ]
+
+        owned = set()
+        for shard in mine:
+            name = f"{SHARD_PREFIX}{shard}"
+            if len(owned) >= share:
+                await MySQL.ReleaseLease(name, self.owner)
+            elif await MySQL.AcquireLease(name, self.owner, expires_at, now):
+                owned.add(shard)
+
+        for shard in free:
+            if len(owned) >= share:
+                break
+            if await MySQL.AcquireLease(f"{SHARD_PREFIX}{shard}", self.owner, expires_at, now):
+                owned.add(shard)
+
+        if owned != self.owned:
+            logger.info("Members checker shards owned: %s of %d.", sorted(owned), self.shards)
+
+        self.owned = frozenset(owned)
+        self.valid_until = started + self.ttl
+        return self.owned
+
+    async def run(self, interval: float) -> None:
+        """
+        Renew the leases forever.
+
+        Args:
+            interval (float): Number of seconds between two renewals, well below the ttl
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.renew()
+            except Exception as e:
+                logger.error("Error while renewing the members checker leases: %s", e)
+
+    async def release(self) -> None:
+        """Release every lease of this process, so other processes take over right away."""
+        for shard in self.owned:
+            await MySQL.ReleaseLease(f"{SHARD_PREFIX}{shard}", self.owner)
+        await MySQL.ReleaseLease(f"{NODE_PREFIX}{self.owner}", self.owner)
+        self.owned = frozenset()
+        self.valid_until = 0.0
+
+# Shared shard leases instance
+shard_leases = ShardLeases(shards=Config["checker_shards"], ttl=Config["checker_lease_ttl"])
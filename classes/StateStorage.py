@@ -0,0 +1,373 @@
+"""
+StateStorage Class
+
+This module provides conversation state storage shared between bot processes including:
+- A telebot state storage keeping each conversation as one record in a shared backend
+- A MySQL backend (the bot_states table) and a Redis backend
+- An in-process stand-in for Redis, for tests and single-process runs
+- Batching of the reads and writes issued during one event loop iteration
+- A per-update memo, so the state filters of one update read the record once
+- Expiry of idle conversations
+
+With a shared backend, a conversation started on one bot process can continue on
+another one, so updates can be spread over several processes.
+"""
+
+import asyncio
+import contextvars
+import json
+import time
+from datetime import timedelta
+from typing import Optional
+
+from telebot.asyncio_storage import StateMemoryStorage
+from telebot.asyncio_storage.base_storage import StateStorageBase, StateDataContext
+
+from database import MySQL
+from utils.logger import get_logger
+from utils.utils import utcnow
+
+logger = get_logger(__name__)
+
+# Records read or written while processing the current update, see begin_update()
+_update_records = contextvars.ContextVar("update_records", default=None)
+
+def begin_update() -> None:
+    """Start a fresh per-update memo of the state records, called once per update by the middleware."""
+    _update_records.set({})
+
+class Batcher:
+    """
+    Coalesces the operations submitted during one event loop iteration into one backend call.
+
+    Attributes:
+        flush: Coroutine function called with {key: value} of a batch, returning results keyed the same way
+    """
+
+    def __init__(self, flush):
+        self.flush = flush
+        self._pending = None
+        self._tasks = set()
+
+    async def submit(self, key: str, value=None):
+        """
+        Add an operation to the current batch and wait for the batch to be flushed.
+
+        Args:
+            key (str): The key of the operation, later operations on a key replace earlier ones
+            value: The value of the operation
+
+        Returns:
+            Any: The result of the flush for the key, None if there is none
+        """
+        loop = asyncio.get_running_loop()
+        if self._pending is None:
+            self._pending = ({}, [])
+            loop.call_soon(self._start)
+
+        items, waiters = self._pending
+        items[key] = value
+        future = loop.create_future()
+        waiters.append((key, future))
+        return await future
+
+    def _start(self) -> None:
+        items, waiters = self._pending
+        self._pending = None
+        task = asyncio.ensure_future(self._run(items, waiters))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: dict, waiters: list) -> None:
+        try:
+            results = await self.flush(items) or {}
+        except Exception as e:
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in waiters:
+            if not future.done():
+                future.set_result(results.get(key))
+
+class MySQLStateBackend:
+    """State backend storing the records in the bot_states table."""
+
+    async def get_many(self, keys: list) -> dict:
+        return await MySQL.GetBotStates(keys, utcnow())
+
+    async def set_many(self, records: dict, ttl: float) -> None:
+        await MySQL.SetBotStates(records, utcnow() + timedelta(seconds=ttl))
+
+    async def purge(self) -> int:
+        return await MySQL.DeleteExpiredBotStates(utcnow())
+
+class RedisStateBackend:
+    """
+    State backend storing the records as JSON strings in Redis.
+
+    Attributes:
+        client: A redis.asyncio client, or a LocalRedis stand-in
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get_many(self, keys: list) -> dict:
+        values = await self.client.mget(keys)
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    async def set_many(self, records: dict, ttl: float) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            for key, record in records.items():
+                if record is None:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, json.dumps(record), px=max(int(ttl * 1000), 1))
+            await pipe.execute()
+
+    async def purge(self) -> int:
+        # Redis expires the keys itself
+        return 0
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the Redis client used by RedisStateBackend.
+
+    It runs the Redis code path without a server, for tests and single-process runs.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def _get(self, key: str):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    async def mget(self, keys: list) -> list:
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ex: int = None, px: int = None) -> bool:
+        ttl = ex if ex else px / 1000 if px else None
+        self.values[key] = (value, time.monotonic() + ttl if ttl else None)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction: bool = True):
+        return LocalPipeline(self)
+
+class LocalPipeline:
+    """Command buffer of LocalRedis, applied at once by execute()."""
+
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self.commands = []
+
+    def set(self, key: str, value: str, ex: int = None, px: int = None):
+        self.commands.append(self.client.set(key, value, ex=ex, px=px))
+        return self
+
+    def delete(self, *keys: str):
+        self.commands.append(self.client.delete(*keys))
+        return self
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [await command for command in commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        for command in self.commands:
+            command.close()
+        self.commands = []
+
+class SharedStateStorage(StateStorageBase):
+    """
+    Telebot state storage keeping each conversation as one {"state", "data"} record in a backend.
+
+    Every read and write of a record is one backend operation, batched with the
+    operations of other updates, and records expire ttl seconds after their last write.
+
+    Attributes:
+        backend: The backend storing the records (MySQLStateBackend or RedisStateBackend)
+        ttl (float): Number of seconds an idle conversation is kept
+        prefix (str): Prefix of the keys
+        separator (str): Separator of the key parts
+    """
+
+    def __init__(self, backend, ttl: float, prefix: str = "telebot", separator: str = ":"):
+        """
+        Initialize the storage.
+
+        Args:
+            backend: The backend storing the records
+            ttl (float): Number of seconds an idle conversation is kept
+            prefix (str, optional): Prefix of the keys. Defaults to "telebot"
+            separator (str, optional): Separator of the key parts. Defaults to ":"
+        """
+        super().__init__()
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.separator = separator
+        self.reads = Batcher(self._flush_reads)
+        self.writes = Batcher(self._flush_writes)
+
+    async def _flush_reads(self, items: dict) -> dict:
+        return await self.backend.get_many(list(items))
+
+    async def _flush_writes(self, items: dict) -> None:
+        await self.backend.set_many(items, self.ttl)
+
+    def _key(self, chat_id, user_id, business_connection_id=None, message_thread_id=None, bot_id=None) -> str:
+        return self._get_key(
+            chat_id, user_id, self.prefix, self.separator,
+            business_connection_id, message_thread_id, bot_id
+        )
+
+    async def _load(self, key: str) -> Optional[dict]:
+        """Read a record, from the per-update memo if this update already read it."""
+        memo = _update_records.get()
+        if memo is not None and key in memo:
+            return memo[key]
+
+        record = await self.reads.submit(key)
+        if memo is not None:
+            memo[key] = record
+        return record
+
+    async def _store(self, key: str, record: Optional[dict]) -> None:
+        """Write a record, None deletes it."""
+        await self.writes.submit(key, record)
+        memo = _update_records.get()
+        if memo is not None:
+            memo[key] = record
+
+    async def set_state(self, chat_id, user_id, state, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> bool:
+        if hasattr(state, "name"):
+            state = state.name
+
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        record = await self._load(key)
+        data = record["data"] if record is not None else {}
+        await self._store(key, {"state": state, "data": data})
+        return True
+
+    async def get_state(self, chat_id, user_id, business_connection_id=None,
+                        message_thread_id=None, bot_id=None) -> Optional[str]:
+        record = await self._load(self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id))
+        return record["state"] if record is not None else None
+
+    async def delete_state(self, chat_id, user_id, business_connection_id=None,
+                           message_thread_id=None, bot_id=None) -> bool:
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        if await self._load(key) is None:
+            return False
+
+        await self._store(key, None)
+        return True
+
+    async def set_data(self, chat_id, user_id, key, value, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> bool:
+        _key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        record = await self._load(_key)
+        if record is None:
+            raise RuntimeError(f"SharedStateStorage: key {_key} does not exist.")
+
+        await self._store(_key, {"state": record["state"], "data": {**record["data"], key: value}})
+        return True
+
+    async def get_data(self, chat_id, user_id, business_connection_id=None,
+                       message_thread_id=None, bot_id=None) -> dict:
+        record = await self._load(self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id))
+        return record["data"] if record is not None else {}
+
+    async def reset_data(self, chat_id, user_id, business_connection_id=None,
+                         message_thread_id=None, bot_id=None) -> bool:
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        record = await self._load(key)
+        if record is None:
+            return False
+
+        await self._store(key, {"state": record["state"], "data": {}})
+        return True
+
+    def get_interactive_data(self, chat_id, user_id, business_connection_id=None,
+                             message_thread_id=None, bot_id=None):
+        return StateDataContext(
+            self,
+            chat_id=chat_id,
+            user_id=user_id,
+            business_connection_id=business_connection_id,
+            message_thread_id=message_thread_id,
+            bot_id=bot_id,
+        )
+
+    async def save(self, chat_id, user_id, data, business_connection_id=None,
+                   message_thread_id=None, bot_id=None) -> bool:
+        key = self._key(chat_id, user_id, business_connection_id, message_thread_id, bot_id)
+        record = await self._load(key)
+        if record is None:
+            return False
+
+        await self._store(key, {"state": record["state"], "data": data})
+        return True
+
+    async def purge_expired(self, interval: float) -> None:
+        """
+        Delete the expired conversations forever.
+
+        Args:
+            interval (float): Number of seconds between two purges
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                purged = await self.backend.purge()
+                if purged:
+                    logger.info("Purged %d expired conversation states.", purged)
+            except Exception as e:
+                logger.error("Error while purging the conversation states: %s", e)
+
+def create_state_storage(kind: str, ttl: float, redis_url: str = None) -> StateStorageBase:
+    """
+    Create the state storage selected in the config.
+
+    Args:
+        kind (str): 'memory' (this process only), 'mysql' or 'redis'
+        ttl (float): Number of seconds an idle conversation is kept (shared storages only)
+        redis_url (str, optional): Redis connection URL, 'local://' uses the in-process stand-in
+
+    Returns:
+        StateStorageBase: The state storage
+
+    Raises:
+        ValueError: If the kind is unknown
+        ImportError: If 'redis' is selected and the redis package is not installed
+    """
+    if kind == "memory":
+        return StateMemoryStorage()
+
+    if kind == "mysql":
+        return SharedStateStorage(MySQLStateBackend(), ttl)
+
+    if kind == "redis":
+        if redis_url == "local://":
+            return SharedStateStorage(RedisStateBackend(LocalRedis()), ttl)
+
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            raise ImportError("The redis state storage requires the redis package: pip install redis")
+        return SharedStateStorage(RedisStateBackend(Redis.from_url(redis_url)), ttl)
+
+    raise ValueError(f"Unknown state storage: {kind}")
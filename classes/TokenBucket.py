@@ -0,0 +1,73 @@
+"""
+TokenBucket Class
+
+This module provides an asyncio token bucket used to pace outgoing requests including:
+- A steady refill rate with a configurable burst size
+- Waiting callers served in arrival order
+- Pausing the bucket when the remote side asks to slow down (e.g. Telegram's retry_after)
+"""
+
+import asyncio
+import time
+
+class TokenBucket:
+    """
+    An asyncio token bucket.
+
+    Attributes:
+        rate (float): Number of tokens added per second
+        capacity (float): Maximum number of tokens the bucket can hold
+        tokens (float): Number of tokens currently available
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        """
+        Initialize a full token bucket.
+
+        Args:
+            rate (float): Number of tokens added per second
+            capacity (float, optional): Maximum burst size. Defaults to the rate
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """
+        Wait until the requested number of tokens is available and take them.
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for the given number of seconds.
+
+        Args:
+            seconds (float): Number of seconds to pause the bucket for
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated_at = self.paused_until
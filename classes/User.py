@@ -10,11 +10,12 @@ This module provides the User class which handles all user-specific operations i
 
 import os 
 import sys
-import json
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import Config, bot
+from telebot.asyncio_helper import ApiTelegramException
 from database import MySQL
+from classes.RequestScheduler import scheduler
+from classes.LocaleCatalog import locale_catalog
 
 class User:
     """
@@ -26,7 +27,7 @@ class User:
     Attributes:
         user_id (int): The Telegram user ID
         user_data (object): User data from the database
-        locales (dict): Loaded localization strings
+        locales (LocaleView): Localization strings in the user's language, shared with the locale catalog
         last_message_id (int): ID of the last sent message
     """
 
@@ -39,8 +40,17 @@ class User:
         """
         self.user_id = user_id
         self.user_data = None
-        self.locales = None
         self.last_message_id = None
+
+    @property
+    def locales(self):
+        """
+        Localization strings for the user's preferred language.
+
+        Falls back to the default language if the preferred language (or a single
+        key of it) is not available.
+        """
+        return locale_catalog.get(self.user_data.lang if self.user_data else None)
             
     async def SendMessage(self, text: str, parse_mode: str = "Html", reply_markup: list = None, protect_content = False):
         """
@@ -55,7 +65,8 @@ class User:
         Returns:
             Message: The sent message object
         """
-        result = await bot.send_message(
+        result = await scheduler.call(
+            "send_message",
             chat_id=self.user_data.chat_id,
             text=text,
             parse_mode=parse_mode,
@@ -78,7 +89,8 @@ class User:
         Returns:
             Message: The sent message object
         """
-        result = await bot.send_photo(
+        result = await scheduler.call(
+            "send_photo",
             chat_id=self.user_data.chat_id,
             photo=image_url,
             caption=text,
@@ -92,37 +104,47 @@ class User:
         """
         Edit the last sent message.
 
-        If editing fails, sends a new message instead.
+        If there is no message to edit, or Telegram refuses the edit (e.g. the message
+        is too old or was deleted), sends a new message instead. Rate limit and network
+        errors are raised instead of being retried as a send.
 
         Args:
             text (str): New text for the message
             parse_mode (str, optional): Message parsing mode. Defaults to "Html"
             reply_markup (list, optional): Keyboard markup. Defaults to None
         """
-        try:
-            await bot.edit_message_text(
-                chat_id=self.user_data.chat_id,
-                message_id=self.last_message_id,
-                text=text,
-                parse_mode=parse_mode,
-                reply_markup=reply_markup
-            )
-        except:
-            await self.SendMessage(
-                text=text,
-                parse_mode=parse_mode,
-                reply_markup=reply_markup
-            )
+        if self.last_message_id is not None:
+            try:
+                await scheduler.call(
+                    "edit_message_text",
+                    chat_id=self.user_data.chat_id,
+                    message_id=self.last_message_id,
+                    text=text,
+                    parse_mode=parse_mode,
+                    reply_markup=reply_markup
+                )
+                return
+            except ApiTelegramException as e:
+                if e.error_code != 400:
+                    raise
+                # Nothing to do if the message already shows this content
+                if "message is not modified" in e.description:
+                    return
+
+        await self.SendMessage(
+            text=text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup
+        )
 
     async def init_asyncs(self):
         """
-        Initialize async components by loading user data and localization strings.
+        Initialize async components by loading user data.
         
         This method must be called after creating a new User instance to load
-        the necessary data from the database and localization files.
+        the necessary data from the database.
         """
         await self.load_data()
-        await self.load_locales()
 
     async def load_data(self):
         """
@@ -133,21 +155,3 @@ class User:
         """
         user = await MySQL.GetUserById(user_id=self.user_id)
         self.user_data = user
-
-    async def load_locales(self):
-        """
-        Load localization strings for the user's preferred language.
-        
-        Loads the appropriate language file based on the user's language preference.
-        Falls back to the default language if the preferred language file is not found.
-        """
-        default_language = Config["DEFAULT_LANGUAGE"]
-        lang_file = f"locales/{self.user_data.lang}.json"
-        
-        if not os.path.isfile(lang_file):
-            lang_file = f"locales/{default_language}.json"
-        
-        with open(lang_file, "r", encoding="utf-8") as f:
-            lang_data = json.load(f)
-        
-        self.locales = lang_data
@@ -5,29 +5,46 @@ This module provides database operations for the bot using SQLAlchemy with async
 It handles all database interactions including:
 - User creation and retrieval
 - Data updates
+- Subscriptions and payments
+- Shared conversation states
+- Leases coordinating several bot processes
 - Bulk operations
 
-The module uses SQLAlchemy's async engine and session management for all database operations.
+The module uses the shared async engine and session factory from database.engine for all
+database operations. Every operation is timed and counted per function on /metrics.
 """
 
 import sys
 import os
+from datetime import datetime
 from typing import Any
-from sqlalchemy import update
+from sqlalchemy import update, delete, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import mysql, sqlite
 from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from models import User
+from models import User, Subscription, Payment, BotState, Lease
+from database.engine import engine, async_session
+from classes.ExpiryScheduler import expiry_scheduler
+from classes.Metrics import metrics, instrument
+from utils.cache import user_cache
+from utils.utils import utcnow
 
-database_url = Config["DB_CONNECTION_STRING"]
-engine = create_async_engine(database_url, future=True)
-async_session = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+db_call_duration = metrics.histogram(
+    "db_call_duration_seconds", "Duration of the database operations", labels=("function",)
+)
+db_call_errors = metrics.counter(
+    "db_call_errors_total", "Database operations raising an exception", labels=("function",)
+)
 
+def _timed(func):
+    """Time a database operation and count its errors, labelled by function name."""
+    return instrument(func, db_call_duration, db_call_errors, function=func.__name__)
+
+@_timed
 async def CreateUser(chat_id: int | str, user_id: int | str, fullname: str, username: str, lang: str):
     """
     Create a new user in the database.
@@ -54,8 +71,56 @@ async def CreateUser(chat_id: int | str, user_id: int | str, fullname: str, user
         await session.commit()
         await session.refresh(new_user)  
 
+    user_cache.invalidate(int(user_id))
     return new_user
 
+@_timed
+async def EnsureUser(chat_id: int | str, user_id: int | str, fullname: str, username: str, lang: str) -> bool:
+    """
+    Create a user unless they already exist, in a single atomic statement.
+
+    Uses INSERT ... ON DUPLICATE KEY UPDATE with a no-op assignment (ON CONFLICT DO
+    NOTHING on the primary key on SQLite), so concurrent first updates from the same
+    user can't race. MySQL can't limit the conflict to the primary key, so a conflict
+    on the unique fullname or username columns is also ignored; the user is therefore
+    looked up by primary key afterwards.
+
+    Args:
+        chat_id (int | str): Telegram chat ID
+        user_id (int | str): Telegram user ID
+        fullname (str): User's full name
+        username (str): User's Telegram username
+        lang (str): User's preferred language code
+
+    Returns:
+        bool: True if the user exists, False if they couldn't be created
+    """
+    values = {
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "fullname": fullname,
+        "username": username,
+        "lang": lang,
+    }
+
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(User).values(**values).on_conflict_do_nothing(index_elements=[User.chat_id])
+    else:
+        stmt = mysql.insert(User).values(**values).on_duplicate_key_update(chat_id=User.chat_id)
+
+    async with async_session() as session:
+        try:
+            await session.execute(stmt)
+            await session.commit()
+        except IntegrityError:
+            # Another user already has the same full name or username (SQLite)
+            await session.rollback()
+        exists = await session.scalar(select(User.chat_id).where(User.chat_id == chat_id)) is not None
+
+    user_cache.invalidate(int(user_id))
+    return exists
+
+@_timed
 async def GetUserById(user_id: int):
     """
     Retrieve a user by their Telegram user ID.
@@ -72,6 +137,7 @@ async def GetUserById(user_id: int):
     
     return user
 
+@_timed
 async def GetUserByField(field: str, value: Any):
     """
     Retrieve a user by any field value.
@@ -94,6 +160,7 @@ async def GetUserByField(field: str, value: Any):
     
     return user
 
+@_timed
 async def UpdateFieldForUser(user_id: int, field: str, value: Any):
     """
     Update a specific field for a user.
@@ -119,12 +186,128 @@ async def UpdateFieldForUser(user_id: int, field: str, value: Any):
         await session.execute(stmt)
         await session.commit()
 
+    user_cache.invalidate(int(user_id))
     return True
 
+@_timed
+async def GetGroupMemberIds(user_ids: list = None):
+    """
+    Retrieve the IDs of the users marked as in the group.
+
+    Args:
+        user_ids (list, optional): Only look at these users. Defaults to every user
+
+    Returns:
+        list: Telegram user IDs of the users whose inGroup flag is set
+    """
+    query = select(User.user_id).where(User.inGroup.is_(True))
+    if user_ids is not None:
+        query = query.where(User.user_id.in_(user_ids))
+
+    async with async_session() as session:
+        result = await session.execute(query)
+        return result.scalars().all()
+
+@_timed
+async def SetUsersInGroup(user_ids: list, inGroup: bool) -> None:
+    """
+    Set the inGroup flag of many users with one UPDATE ... WHERE user_id IN (...).
+
+    Args:
+        user_ids (list): Telegram user IDs
+        inGroup (bool): Whether the users are in the group
+    """
+    if not user_ids:
+        return
+
+    async with async_session() as session:
+        await session.execute(update(User).where(User.user_id.in_(user_ids)).values(inGroup=inGroup))
+        await session.commit()
+
+    for user_id in user_ids:
+        user_cache.invalidate(int(user_id))
+
+async def IterUserPages(page_size: int = None):
+    """
+    Stream all users from the database in pages ordered by primary key.
+
+    Pages are fetched with keyset pagination (WHERE chat_id > last ORDER BY chat_id LIMIT n),
+    each in its own short-lived session, so memory use stays flat however large the
+    users table grows and no connection is held between pages.
+
+    Args:
+        page_size (int, optional): Number of users per page. Defaults to Config["db_page_size"]
+
+    Yields:
+        list: The next page of User objects
+    """
+    page_size = page_size or Config["db_page_size"]
+    last_chat_id = None
+
+    while True:
+        stmt = select(User).order_by(User.chat_id).limit(page_size)
+        if last_chat_id is not None:
+            stmt = stmt.where(User.chat_id > last_chat_id)
+
+        # Async generators are not decorated with @_timed, each page is timed here
+        with db_call_duration.time(function="IterUserPages"):
+            async with async_session() as session:
+                result = await session.execute(stmt)
+                users = result.scalars().all()
+
+        if not users:
+            return
+
+        yield users
+
+        if len(users) < page_size:
+            return
+        last_chat_id = users[-1].chat_id
+
+async def IterUsers(page_size: int = None):
+    """
+    Stream all users from the database one by one.
+
+    Args:
+        page_size (int, optional): Number of users fetched per query. Defaults to Config["db_page_size"]
+
+    Yields:
+        User: The next User object, ordered by primary key
+    """
+    async for users in IterUserPages(page_size):
+        for user in users:
+            yield user
+
+@_timed
+async def ClaimEmail(user_id: int, email: str) -> bool:
+    """
+    Link an email address to a user, relying on the unique constraint of users.email.
+
+    Args:
+        user_id (int): Telegram user ID
+        email (str): The email address to link
+
+    Returns:
+        bool: True if the email was linked, False if the user has no record
+
+    Raises:
+        IntegrityError: If another user already uses the email address
+    """
+    async with async_session() as session:
+        result = await session.execute(update(User).where(User.user_id == user_id).values(email=email))
+        await session.commit()
+
+    user_cache.invalidate(int(user_id))
+    return result.rowcount > 0
+
+@_timed
 async def GetAllUsers():
     """
     Retrieve all users from the database.
 
+    Note:
+        This loads every user at once, prefer IterUsers or IterUserPages for bulk jobs.
+
     Returns:
         list: List of all User objects in the database.
         If an error occurs, returns an empty list.
@@ -137,3 +320,544 @@ async def GetAllUsers():
         except Exception as e:
             print(f"Error while getting users: {e}")
             return []
+
+def _upsert(model, values: dict, update_fields: list):
+    """
+    Build an INSERT statement that updates the given fields on a key conflict.
+
+    Uses INSERT ... ON DUPLICATE KEY UPDATE on MySQL and INSERT ... ON CONFLICT
+    on SQLite, so writes stay a single round trip on both backends.
+
+    Args:
+        model: The ORM model to insert into
+        values (dict | list): Column values for the new row, or a list of them for several rows
+        update_fields (list): Fields to overwrite if the row already exists
+
+    Returns:
+        Insert: The dialect specific insert statement
+    """
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(model).values(values)
+        primary_keys = [column.name for column in model.__table__.primary_key]
+        return stmt.on_conflict_do_update(
+            index_elements=primary_keys,
+            set_={field: stmt.excluded[field] for field in update_fields}
+        )
+
+    stmt = mysql.insert(model).values(values)
+    return stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in update_fields})
+
+@_timed
+async def GetSubscription(user_id: int):
+    """
+    Retrieve the subscription of a user.
+
+    Args:
+        user_id (int): Telegram user ID
+
+    Returns:
+        Subscription: Subscription object if found, None otherwise
+    """
+    async with async_session() as session:
+        return await session.get(Subscription, user_id)
+
+@_timed
+async def GetActiveSubscriptionUserIds(user_ids: list, now: datetime) -> list:
+    """
+    Retrieve which of the given users have an active subscription, with one SELECT.
+
+    Args:
+        user_ids (list): Telegram user IDs
+        now (datetime): Naive UTC datetime the subscriptions must expire after
+
+    Returns:
+        list: IDs of the users whose subscription expires after now
+    """
+    if not user_ids:
+        return []
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(Subscription.user_id)
+            .where(Subscription.user_id.in_(user_ids), Subscription.expires_at > now)
+        )
+        return result.scalars().all()
+
+@_timed
+async def SetSubscription(user_id: int, expires_at: datetime, plan: str = None, source: str = None):
+    """
+    Create or replace the subscription of a user.
+
+    Args:
+        user_id (int): Telegram user ID
+        expires_at (datetime): Expiration time of the subscription (naive UTC)
+        plan (str, optional): The purchased plan
+        source (str, optional): Where the subscription came from
+    """
+    async with async_session() as session:
+        stmt = _upsert(
+            Subscription,
+            {"user_id": user_id, "expires_at": expires_at, "plan": plan, "source": source},
+            ["expires_at", "plan", "source"]
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+    expiry_scheduler.schedule(user_id, expires_at)
+    user_cache.invalidate(int(user_id))
+
+@_timed
+async def DeleteExpiredSubscriptions(user_ids: list, before: datetime) -> list:
+    """
+    Delete the subscriptions of many users that expired at or before the given time.
+
+    The users are handled in chunks of Config["db_page_size"], each in one transaction
+    with one SELECT ... FOR UPDATE and one DELETE ... WHERE user_id IN (...), so a mass
+    expiry takes a few round trips and subscriptions extended concurrently are kept.
+
+    Args:
+        user_ids (list): Telegram user IDs
+        before (datetime): Naive UTC datetime to compare against
+
+    Returns:
+        list: IDs of the users whose subscription was deleted
+    """
+    deleted = []
+    page_size = Config["db_page_size"]
+
+    for start in range(0, len(user_ids), page_size):
+        chunk = user_ids[start:start + page_size]
+        async with async_session() as session:
+            result = await session.execute(
+                select(Subscription.user_id)
+                .where(Subscription.user_id.in_(chunk), Subscription.expires_at <= before)
+                .with_for_update()
+            )
+            expired = result.scalars().all()
+            if expired:
+                await session.execute(delete(Subscription).where(Subscription.user_id.in_(expired)))
+            await session.commit()
+        deleted.extend(expired)
+
+    for user_id in deleted:
+        expiry_scheduler.remove(user_id)
+        user_cache.invalidate(int(user_id))
+    return deleted
+
+async def IterExpiredSubscriptionPages(before: datetime, shards: int = 1, owned=None, page_size: int = None):
+    """
+    Stream the subscriptions that expired at or before the given time, in pages.
+
+    Pages are read with an index range scan on subscriptions.expires_at and keyset
+    pagination on (expires_at, user_id), each in its own short-lived session, so a
+    burst of expirations is never loaded at once.
+
+    Args:
+        before (datetime): Naive UTC datetime to compare against
+        shards (int, optional): Number of shards the users are split into. Defaults to 1
+        owned (iterable, optional): Only return the subscriptions of users in these shards
+            (user_id % shards). Defaults to every shard
+        page_size (int, optional): Number of subscriptions per page. Defaults to Config["db_page_size"]
+
+    Yields:
+        list: The next page of Subscription objects, ordered by expiration time
+    """
+    page_size = page_size or Config["db_page_size"]
+    last = None
+
+    while True:
+        stmt = (
+            select(Subscription)
+            .where(Subscription.expires_at <= before)
+            .order_by(Subscription.expires_at, Subscription.user_id)
+            .limit(page_size)
+        )
+        if owned is not None:
+            stmt = stmt.where((Subscription.user_id % shards).in_(list(owned)))
+        if last is not None:
+            stmt = stmt.where(or_(
+                Subscription.expires_at > last[0],
+                and_(Subscription.expires_at == last[0], Subscription.user_id > last[1]),
+            ))
+
+        # Async generators are not decorated with @_timed, each page is timed here
+        with db_call_duration.time(function="IterExpiredSubscriptionPages"):
+            async with async_session() as session:
+                result = await session.execute(stmt)
+                subscriptions = result.scalars().all()
+
+        if not subscriptions:
+            return
+
+        yield subscriptions
+
+        if len(subscriptions) < page_size:
+            return
+        last = (subscriptions[-1].expires_at, subscriptions[-1].user_id)
+
+@_timed
+async def GetSubscriptionsExpiringBetween(start: datetime, end: datetime):
+    """
+    Retrieve all subscriptions expiring after start and at or before end.
+
+    Args:
+        start (datetime): Naive UTC start of the range (exclusive)
+        end (datetime): Naive UTC end of the range (inclusive)
+
+    Returns:
+        list: List of Subscription objects ordered by expiration time
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(Subscription)
+            .where(Subscription.expires_at > start, Subscription.expires_at <= end)
+            .order_by(Subscription.expires_at)
+        )
+        return result.scalars().all()
+
+@_timed
+async def CreatePayment(txn_id: str, user_id: int, coin: str, amount: str, address: str,
+                        qrcode_url: str, status_url: str, deadline: datetime, created_at: datetime,
+                        status: int = 0):
+    """
+    Record a new CoinPayments transaction.
+
+    Args:
+        txn_id (str): CoinPayments transaction ID
+        user_id (int): Telegram user ID of the buyer
+        coin (str): The coin_ref the user pays with
+        amount (str): Amount to pay, in the coin's units
+        address (str): Address the payment must be sent to
+        qrcode_url (str): URL of the payment QR code
+        status_url (str): URL of the CoinPayments status page
+        deadline (datetime): Time after which the transaction can't be paid anymore (naive UTC)
+        created_at (datetime): Creation time of the transaction (naive UTC)
+        status (int, optional): The CoinPayments status. Defaults to 0 (pending)
+
+    Returns:
+        Payment: The newly created payment object
+    """
+    async with async_session() as session:
+        payment = Payment(
+            txn_id=txn_id,
+            user_id=user_id,
+            coin=coin,
+            amount=str(amount),
+            address=address,
+            qrcode_url=qrcode_url,
+            status_url=status_url,
+            status=status,
+            deadline=deadline,
+            created_at=created_at,
+        )
+        session.add(payment)
+        await session.commit()
+        await session.refresh(payment)
+
+    return payment
+
+@_timed
+async def GetPendingPayment(user_id: int, coin: str, valid_after: datetime):
+    """
+    Retrieve a user's pending transaction for a coin that can still be paid.
+
+    Args:
+        user_id (int): Telegram user ID of the buyer
+        coin (str): The coin_ref the user pays with
+        valid_after (datetime): Only return transactions whose deadline is later (naive UTC)
+
+    Returns:
+        Payment: The pending payment with the latest deadline, None if there is none
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(Payment)
+            .where(
+                Payment.user_id == user_id,
+                Payment.coin == coin,
+                Payment.deadline > valid_after,
+                Payment.status >= 0,
+                Payment.status < 100,
+            )
+            .order_by(Payment.deadline.desc())
+            .limit(1)
+        )
+        return result.scalars().first()
+
+@_timed
+async def GetPaymentByTxnId(txn_id: str):
+    """
+    Retrieve a payment by its CoinPayments transaction ID.
+
+    Args:
+        txn_id (str): CoinPayments transaction ID
+
+    Returns:
+        Payment: Payment object if found, None otherwise
+    """
+    async with async_session() as session:
+        return await session.get(Payment, txn_id)
+
+@_timed
+async def UpdatePaymentStatus(txn_id: str, status: int) -> bool:
+    """
+    Update the CoinPayments status of a payment.
+
+    Notifications can arrive out of order, so a final status (complete or failed)
+    is never changed and a pending status is only ever raised.
+
+    Args:
+        txn_id (str): CoinPayments transaction ID
+        status (int): The new CoinPayments status
+
+    Returns:
+        bool: True if the payment exists, False otherwise
+    """
+    conditions = [Payment.txn_id == txn_id, Payment.status >= 0, Payment.status < 100]
+    if 0 <= status < 100:
+        conditions.append(Payment.status < status)
+
+    async with async_session() as session:
+        result = await session.execute(update(Payment).where(*conditions).values(status=status))
+        await session.commit()
+        if result.rowcount:
+            return True
+
+        return await session.get(Payment, txn_id) is not None
+
+@_timed
+async def ApplyPayment(txn_id: str, expires_at: datetime, plan: str = None, source: str = None):
+    """
+    Grant the subscription of a completed payment, at most once per transaction.
+
+    The payment is claimed with a conditional UPDATE on applied_at and the
+    subscription is written in the same transaction, so concurrent or repeated
+    calls for the same txn_id grant the subscription only once.
+
+    Args:
+        txn_id (str): CoinPayments transaction ID
+        expires_at (datetime): Expiration time of the subscription (naive UTC)
+        plan (str, optional): The purchased plan
+        source (str, optional): Where the subscription came from
+
+    Returns:
+        int: Telegram user ID of the buyer if the subscription was granted by this call,
+            None if the payment is unknown, not complete or already applied
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(Payment)
+            .where(Payment.txn_id == txn_id, Payment.status >= 100, Payment.applied_at.is_(None))
+            .values(applied_at=utcnow())
+        )
+        if not result.rowcount:
+            await session.rollback()
+            return None
+
+        user_id = await session.scalar(select(Payment.user_id).where(Payment.txn_id == txn_id))
+        await session.execute(_upsert(
+            Subscription,
+            {"user_id": user_id, "expires_at": expires_at, "plan": plan, "source": source},
+            ["expires_at", "plan", "source"]
+        ))
+        await session.commit()
+
+    expiry_scheduler.schedule(user_id, expires_at)
+    user_cache.invalidate(int(user_id))
+    return user_id
+
+@_timed
+async def MarkPaymentNotified(txn_id: str) -> bool:
+    """
+    Record that the buyer of an applied payment was sent their invite link.
+
+    Args:
+        txn_id (str): CoinPayments transaction ID
+
+    Returns:
+        bool: True if the payment was marked by this call, False if it already was
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(Payment)
+            .where(Payment.txn_id == txn_id, Payment.applied_at.is_not(None), Payment.notified_at.is_(None))
+            .values(notified_at=utcnow())
+        )
+        await session.commit()
+
+    return result.rowcount > 0
+
+@_timed
+async def GetUnfinishedPayments(applied_before: datetime):
+    """
+    Retrieve the transaction IDs of completed payments whose subscription wasn't
+    granted yet, or whose buyer wasn't notified.
+
+    Args:
+        applied_before (datetime): Only return payments granted but not notified if they
+            were granted earlier, so payments still being notified are left alone (naive UTC)
+
+    Returns:
+        list: List of CoinPayments transaction IDs
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(Payment.txn_id).where(
+                Payment.status >= 100,
+                Payment.notified_at.is_(None),
+                or_(Payment.applied_at.is_(None), Payment.applied_at < applied_before),
+            )
+        )
+        return result.scalars().all()
+
+@_timed
+async def GetBotStates(keys: list, now: datetime):
+    """
+    Retrieve the conversation states stored under several keys in one query.
+
+    Args:
+        keys (list): State storage keys
+        now (datetime): Naive UTC current time, expired states are ignored
+
+    Returns:
+        dict: {"state": ..., "data": ...} records keyed by state storage key, missing keys are omitted
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(BotState.key, BotState.state, BotState.data)
+            .where(BotState.key.in_(keys), BotState.expires_at > now)
+        )
+        return {key: {"state": state, "data": data or {}} for key, state, data in result.all()}
+
+@_timed
+async def SetBotStates(records: dict, expires_at: datetime):
+    """
+    Write or delete several conversation states in one transaction.
+
+    Args:
+        records (dict): {"state": ..., "data": ...} records keyed by state storage key,
+            a None record deletes the key
+        expires_at (datetime): Expiration time of the written states (naive UTC)
+    """
+    rows = [
+        {"key": key, "state": record["state"], "data": record["data"], "expires_at": expires_at}
+        for key, record in records.items() if record is not None
+    ]
+    deleted = [key for key, record in records.items() if record is None]
+
+    async with async_session() as session:
+        if rows:
+            await session.execute(_upsert(BotState, rows, ["state", "data", "expires_at"]))
+        if deleted:
+            await session.execute(delete(BotState).where(BotState.key.in_(deleted)))
+        await session.commit()
+
+@_timed
+async def DeleteExpiredBotStates(before: datetime) -> int:
+    """
+    Delete the conversation states that expired at or before the given time.
+
+    Args:
+        before (datetime): Naive UTC datetime to compare against
+
+    Returns:
+        int: The number of deleted states
+    """
+    async with async_session() as session:
+        result = await session.execute(delete(BotState).where(BotState.expires_at <= before))
+        await session.commit()
+
+    return result.rowcount
+
+@_timed
+async def AcquireLease(name: str, owner: str, expires_at: datetime, now: datetime) -> bool:
+    """
+    Acquire or renew a lease.
+
+    The lease is granted if it doesn't exist, already belongs to the owner or
+    has expired. The conditional UPDATE/INSERT makes the claim atomic, so
+    concurrent processes never both hold the same lease.
+
+    Args:
+        name (str): Name of the leased resource
+        owner (str): Identifier of the claiming process
+        expires_at (datetime): New expiration time of the lease (naive UTC)
+        now (datetime): Naive UTC current time
+
+    Returns:
+        bool: True if the owner holds the lease until expires_at, False otherwise
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(Lease)
+            .where(Lease.name == name, (Lease.owner == owner) | (Lease.expires_at <= now))
+            .values(owner=owner, expires_at=expires_at)
+        )
+        if result.rowcount:
+            await session.commit()
+            return True
+
+        try:
+            session.add(Lease(name=name, owner=owner, expires_at=expires_at))
+            await session.commit()
+            return True
+        except IntegrityError:
+            # The lease exists and is held by another process
+            await session.rollback()
+            return False
+
+@_timed
+async def ReleaseLease(name: str, owner: str) -> bool:
+    """
+    Release a lease held by the owner.
+
+    Args:
+        name (str): Name of the leased resource
+        owner (str): Identifier of the releasing process
+
+    Returns:
+        bool: True if the lease was released, False if the owner didn't hold it
+    """
+    async with async_session() as session:
+        result = await session.execute(delete(Lease).where(Lease.name == name, Lease.owner == owner))
+        await session.commit()
+
+    return result.rowcount > 0
+
+@_timed
+async def GetLeases(prefix: str, now: datetime):
+    """
+    Retrieve the owners of the unexpired leases whose name starts with a prefix.
+
+    Args:
+        prefix (str): Prefix of the lease names
+        now (datetime): Naive UTC current time, expired leases are ignored
+
+    Returns:
+        dict: Owner of each lease, keyed by lease name
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            select(Lease.name, Lease.owner).where(Lease.name.startswith(prefix), Lease.expires_at > now)
+        )
+        return {name: owner for name, owner in result.all()}
+
+@_timed
+async def DeleteExpiredLeases(prefix: str, before: datetime) -> int:
+    """
+    Delete the leases whose name starts with a prefix and that expired at or before the given time.
+
+    Args:
+        prefix (str): Prefix of the lease names
+        before (datetime): Naive UTC datetime to compare against
+
+    Returns:
+        int: The number of deleted leases
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            delete(Lease).where(Lease.name.startswith(prefix), Lease.expires_at <= before)
+        )
+        await session.commit()
+
+    return result.rowcount
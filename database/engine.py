@@ -0,0 +1,104 @@
+"""
+Database Engine Module
+
+This module creates the single database engine shared by the whole process including:
+- Connection pool settings read from the config
+- The session factory used by the database operations
+- Connection pool statistics (checked out connections, overflow, checkout wait times),
+  also served on /metrics
+- Statement timing and per-update query counts (see database.profiling)
+
+Every database module must use the engine from here, so the process holds one
+connection pool that can be sized for peak load.
+"""
+
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import Config
+from classes.Metrics import metrics
+from database import profiling
+
+# Time spent by checkouts waiting for a pooled connection
+pool_wait_stats = {"count": 0, "total": 0.0, "max": 0.0}
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that records how long each checkout waits for a connection.
+
+    The wait time includes opening a new connection when the pool has none idle.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            pool_wait_stats["count"] += 1
+            pool_wait_stats["total"] += waited
+            pool_wait_stats["max"] = max(pool_wait_stats["max"], waited)
+
+def create_engine(database_url: str):
+    """
+    Create an async engine with the pool settings from the config.
+
+    Args:
+        database_url (str): The database connection string
+
+    Returns:
+        AsyncEngine: The configured engine
+    """
+    # SQLite (used for local runs and benchmarks) keeps SQLAlchemy's default pool,
+    # concurrent writers wait for the database lock instead of failing right away
+    if database_url.startswith("sqlite"):
+        return create_async_engine(
+            database_url,
+            future=True,
+            connect_args={"timeout": Config["db_pool_timeout"]},
+        )
+
+    return create_async_engine(
+        database_url,
+        future=True,
+        poolclass=TimedQueuePool,
+        pool_size=Config["db_pool_size"],
+        max_overflow=Config["db_max_overflow"],
+        pool_timeout=Config["db_pool_timeout"],
+        pool_recycle=Config["db_pool_recycle"],
+        pool_pre_ping=Config["db_pool_pre_ping"],
+    )
+
+def pool_stats() -> dict:
+    """
+    Get the statistics of the connection pool.
+
+    Returns:
+        dict: Pool size, checked in/out connections, overflow and checkout wait times (seconds)
+    """
+    pool = engine.pool
+    stats = {
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        "wait_count": pool_wait_stats["count"],
+        "wait_time_total": pool_wait_stats["total"],
+        "wait_time_max": pool_wait_stats["max"],
+    }
+    return stats
+
+engine = create_engine(Config["DB_CONNECTION_STRING"])
+profiling.install(engine.sync_engine)
+async_session = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=AsyncSession)
+
+metrics.gauge(
+    "db_pool_connections", "Connections of the pool by state", labels=("state",),
+    collect=lambda: {state: pool_stats()[state] for state in ("size", "checked_in", "checked_out", "overflow")}
+)
+metrics.counter("db_pool_waits_total", "Connection checkouts", collect=lambda: pool_wait_stats["count"])
+metrics.counter(
+    "db_pool_wait_seconds_total", "Time checkouts waited for a connection", collect=lambda: pool_wait_stats["total"]
+)
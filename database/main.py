@@ -2,21 +2,18 @@
 Database Initialization Module
 
 This module handles the initialization and setup of the database including:
-- Engine creation
 - Table creation
 - Schema management
+- One-off data migrations
 
-The module uses SQLAlchemy's async engine for database operations and ensures
+The module uses the shared async engine from database.engine and ensures
 all necessary tables are created at application startup.
 """
 
-from sqlalchemy.ext.asyncio import create_async_engine
-from database.models import Base 
-from config import Config
-
-# Create async engine using connection string from config
-database_url = Config["DB_CONNECTION_STRING"]
-engine = create_async_engine(database_url, future=True)
+from datetime import datetime, timezone
+from sqlalchemy import select, update, null
+from database.models import Base, User, Subscription
+from database.engine import engine
 
 async def create_tables():
     """
@@ -37,3 +34,48 @@ async def create_tables():
     """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def migrate_subscription_data():
+    """
+    Move subscriptions from the legacy users.subscription_data JSON column
+    into the subscriptions table.
+
+    Every user with an expiration date in subscription_data gets a subscription
+    row (unless one already exists) and the JSON column is cleared afterwards.
+
+    Note:
+        This function is safe to call multiple times, once the JSON column is
+        empty it does nothing.
+
+    Returns:
+        int: The number of migrated subscriptions
+    """
+    migrated = 0
+
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            select(User.user_id, User.subscription_data).where(User.subscription_data.is_not(None))
+        )
+        rows = result.all()
+
+        for user_id, subscription_data in rows:
+            if subscription_data and subscription_data.get("expiration_date"):
+                expires_at = datetime.fromtimestamp(
+                    int(subscription_data["expiration_date"]), tz=timezone.utc
+                ).replace(tzinfo=None)
+
+                exists = await conn.scalar(select(Subscription.user_id).where(Subscription.user_id == user_id))
+                if not exists:
+                    await conn.execute(Subscription.__table__.insert().values(
+                        user_id=user_id,
+                        expires_at=expires_at,
+                        source="legacy",
+                    ))
+                    migrated += 1
+
+            await conn.execute(
+                update(User).where(User.user_id == user_id).values(subscription_data=null())
+            )
+
+    return migrated
@@ -5,14 +5,17 @@ This module defines the SQLAlchemy ORM models for the bot's database schema.
 It includes models for:
 - Users and their attributes
 - Subscription data
+- CoinPayments transactions
+- Conversation states shared between bot processes
+- Leases coordinating work between bot processes
 - System configurations
 
 The models use SQLAlchemy's declarative base system for defining database tables
 and their relationships.
 """
 
-from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, JSON
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, JSON, Index
 from datetime import datetime
 
 from config import Config
@@ -35,7 +38,8 @@ class User(Base):
         banned (Boolean): User ban status
         inGroup (Boolean): Whether user is in the group
         lang (String): User's preferred language
-        subscription_data (JSON): Subscription details and status
+        subscription_data (JSON): Legacy subscription details, migrated to the subscriptions table
+        subscription (Subscription): The user's subscription, loaded together with the user
     """
     __tablename__ = 'users'
 
@@ -49,6 +53,14 @@ class User(Base):
     lang = Column(String(5), default=Config["DEFAULT_LANGUAGE"])
     subscription_data = Column(JSON)
 
+    subscription = relationship(
+        "Subscription",
+        primaryjoin="User.user_id == foreign(Subscription.user_id)",
+        uselist=False,
+        viewonly=True,
+        lazy="joined",
+    )
+
     def to_dict(self):
         """
         Convert the user object to a dictionary.
@@ -67,6 +79,172 @@ class User(Base):
             "subscription_data": self.subscription_data,
         }
     
+class Subscription(Base):
+    """
+    Subscription Model
+
+    Represents the subscription of a Telegram user. Expiration times are stored
+    as naive UTC datetimes in an indexed column, so expired or soon expiring
+    subscriptions can be found with an index range scan.
+
+    Attributes:
+        user_id (BigInteger): Primary key, Telegram user ID
+        expires_at (DateTime): Expiration time of the subscription (UTC)
+        plan (String): The purchased plan, e.g. "7d"
+        source (String): Where the subscription came from (coinpayments, admin, legacy)
+    """
+    __tablename__ = 'subscriptions'
+
+    user_id = Column(BigInteger, primary_key=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    plan = Column(String(20))
+    source = Column(String(20))
+
+    def to_dict(self):
+        """
+        Convert the subscription object to a dictionary.
+
+        Returns:
+            dict: Dictionary containing all subscription attributes
+        """
+        return {
+            "user_id": self.user_id,
+            "expires_at": self.expires_at,
+            "plan": self.plan,
+            "source": self.source,
+        }
+
+class Payment(Base):
+    """
+    Payment Model
+
+    Represents a CoinPayments transaction created for a user. Pending transactions
+    are reused when the user picks the same coin again before the deadline, and
+    IPN notifications update them by txn_id. A completed payment grants its
+    subscription once, applied_at records when it did and notified_at when the
+    buyer got their invite link.
+
+    Attributes:
+        txn_id (String): Primary key, CoinPayments transaction ID
+        user_id (BigInteger): Telegram user ID of the buyer
+        coin (String): The coin_ref the user pays with
+        amount (String): Amount to pay, in the coin's units, as returned by CoinPayments
+        address (String): Address the payment must be sent to
+        qrcode_url (String): URL of the payment QR code
+        status_url (String): URL of the CoinPayments status page
+        status (Integer): CoinPayments status (< 0 failed, 0-99 pending, >= 100 complete)
+        deadline (DateTime): Time after which the transaction can't be paid anymore (UTC)
+        created_at (DateTime): Creation time of the transaction (UTC)
+        applied_at (DateTime): Time the subscription was granted (UTC), None until then
+        notified_at (DateTime): Time the buyer was sent their invite link (UTC), None until then
+    """
+    __tablename__ = 'payments'
+    __table_args__ = (
+        Index('ix_payments_user_coin_deadline', 'user_id', 'coin', 'deadline'),
+    )
+
+    txn_id = Column(String(64), primary_key=True, nullable=False)
+    user_id = Column(BigInteger, nullable=False)
+    coin = Column(String(20), nullable=False)
+    amount = Column(String(32), nullable=False)
+    address = Column(String(255))
+    qrcode_url = Column(String(255))
+    status_url = Column(String(255))
+    status = Column(Integer, default=0, nullable=False)
+    deadline = Column(DateTime, nullable=False)
+    created_at = Column(DateTime)
+    applied_at = Column(DateTime)
+    notified_at = Column(DateTime)
+
+    def to_dict(self):
+        """
+        Convert the payment object to a dictionary.
+
+        Returns:
+            dict: Dictionary containing all payment attributes
+        """
+        return {
+            "txn_id": self.txn_id,
+            "user_id": self.user_id,
+            "coin": self.coin,
+            "amount": self.amount,
+            "address": self.address,
+            "qrcode_url": self.qrcode_url,
+            "status_url": self.status_url,
+            "status": self.status,
+            "deadline": self.deadline,
+            "created_at": self.created_at,
+            "applied_at": self.applied_at,
+            "notified_at": self.notified_at,
+        }
+
+class BotState(Base):
+    """
+    BotState Model
+
+    Represents the conversation state of a user, used by the MySQL state storage
+    so every bot process sees the same conversations. Rows past expires_at are
+    ignored and purged periodically.
+
+    Attributes:
+        key (String): Primary key, the state storage key of the user in a chat
+        state (String): Name of the current state, None if only data is stored
+        data (JSON): Data collected during the conversation
+        expires_at (DateTime): Time after which the state is discarded (UTC)
+    """
+    __tablename__ = 'bot_states'
+
+    key = Column(String(255), primary_key=True, nullable=False)
+    state = Column(String(255))
+    data = Column(JSON)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+    def to_dict(self):
+        """
+        Convert the state object to a dictionary.
+
+        Returns:
+            dict: Dictionary containing all state attributes
+        """
+        return {
+            "key": self.key,
+            "state": self.state,
+            "data": self.data,
+            "expires_at": self.expires_at,
+        }
+
+class Lease(Base):
+    """
+    Lease Model
+
+    Represents a time-limited claim of a process on a named resource, e.g. a shard
+    of the members checker. A lease is free once expires_at has passed, and its
+    owner must renew it before then to keep it.
+
+    Attributes:
+        name (String): Primary key, name of the leased resource
+        owner (String): Identifier of the process holding the lease
+        expires_at (DateTime): Time at which the lease is released (UTC)
+    """
+    __tablename__ = 'leases'
+
+    name = Column(String(64), primary_key=True, nullable=False)
+    owner = Column(String(128), nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        """
+        Convert the lease object to a dictionary.
+
+        Returns:
+            dict: Dictionary containing all lease attributes
+        """
+        return {
+            "name": self.name,
+            "owner": self.owner,
+            "expires_at": self.expires_at,
+        }
+
 # Commented out Transaction model for future implementation
 # class Transaction(Base):
 #     __tablename__ = 'transactions'
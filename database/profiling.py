@@ -0,0 +1,186 @@
+"""
+Database Profiling Module
+
+This module instruments the statements run by the shared engine including:
+- Timing every statement with SQLAlchemy engine events
+- Logging the statements slower than Config["db_slow_query_threshold"], with the
+  shape of their parameters (names and types, never the values)
+- Counting the statements run while processing each update, through a contextvar
+- Flagging the updates running more statements than Config["db_query_budget"],
+  with the statements they repeated, so N+1 patterns show up in the log
+
+The counts are also served on /metrics.
+"""
+
+import contextvars
+import re
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from config import Config
+from classes.Metrics import metrics
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Statements of the update being processed, see begin_update()
+_update_queries = contextvars.ContextVar("update_queries", default=None)
+
+# Progress counters (statements, statement_time, updates, over_budget, slow_queries)
+stats = Counter()
+
+statement_duration = metrics.histogram(
+    "db_statement_duration_seconds", "Duration of the SQL statements", labels=("operation",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+slow_statements = metrics.counter(
+    "db_slow_statements_total", "SQL statements slower than the slow query threshold", labels=("operation",)
+)
+queries_per_update = metrics.histogram(
+    "db_queries_per_update", "SQL statements run while processing an update",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+)
+metrics.counter(
+    "db_query_budget_exceeded_total", "Updates running more SQL statements than the query budget",
+    collect=lambda: stats["over_budget"]
+)
+
+class UpdateQueries:
+    """
+    The statements run while processing one update.
+
+    Attributes:
+        update_type (str): Type of the update, e.g. 'message'
+        event_id (int): ID of the message or callback query
+        user_id (int): Telegram user ID of the sender
+        count (int): Number of statements
+        time (float): Total execution time of the statements, in seconds
+        statements (Counter): Number of runs of each statement
+    """
+
+    def __init__(self, update_type: str, event_id, user_id):
+        self.update_type = update_type
+        self.event_id = event_id
+        self.user_id = user_id
+        self.count = 0
+        self.time = 0.0
+        self.statements = Counter()
+
+def _operation(statement: str) -> str:
+    """Get the SQL verb of a statement, e.g. 'SELECT'."""
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+
+def _summary(statement: str, length: int = 120) -> str:
+    """Collapse a statement to one line, short enough to be logged."""
+    statement = re.sub(r"\s+", " ", statement).strip()
+    return statement if len(statement) <= length else statement[:length] + "..."
+
+def _parameters_shape(parameters, executemany: bool) -> str:
+    """
+    Describe the parameters of a statement without their values.
+
+    Returns:
+        str: e.g. "(int, str)", "{user_id: int}" or "500 x (int, datetime)"
+    """
+    if executemany and parameters:
+        return f"{len(parameters)} x {_parameters_shape(parameters[0], False)}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiling_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_profiling_started", None)
+    if started is None:
+        return
+
+    elapsed = time.perf_counter() - started
+    operation = _operation(statement)
+    statement_duration.observe(elapsed, operation=operation)
+    stats["statements"] += 1
+    stats["statement_time"] += elapsed
+
+    update = _update_queries.get()
+    if update is not None:
+        update.count += 1
+        update.time += elapsed
+        update.statements[statement] += 1
+
+    if elapsed >= Config["db_slow_query_threshold"]:
+        stats["slow_queries"] += 1
+        slow_statements.inc(operation=operation)
+        logger.warning(
+            "Slow query (%.3fs): %s; parameters: %s%s",
+            elapsed, _summary(statement), _parameters_shape(parameters, executemany),
+            f"; update {update.update_type} {update.event_id} of user {update.user_id}" if update else ""
+        )
+
+def install(engine) -> None:
+    """
+    Time the statements run by an engine.
+
+    Args:
+        engine: The engine (the sync_engine of an async engine)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def begin_update(update_type: str, event_id, user_id) -> UpdateQueries:
+    """
+    Start counting the statements of an update, called once per update by the middleware.
+
+    If the caller already started counting the update (e.g. the replay benchmark,
+    to read the count afterwards), that count is continued.
+
+    Args:
+        update_type (str): Type of the update, e.g. 'message'
+        event_id: ID of the message or callback query
+        user_id: Telegram user ID of the sender
+
+    Returns:
+        UpdateQueries: The statements of the update
+    """
+    update = _update_queries.get()
+    if update is None:
+        update = UpdateQueries(update_type, event_id, user_id)
+        _update_queries.set(update)
+    else:
+        update.update_type, update.event_id, update.user_id = update_type, event_id, user_id
+    return update
+
+def end_update() -> UpdateQueries | None:
+    """
+    Stop counting the statements of the current update, and log it if it went over the query budget.
+
+    Returns:
+        UpdateQueries | None: The statements of the update, None if begin_update() wasn't called
+    """
+    update = _update_queries.get()
+    if update is None:
+        return None
+    _update_queries.set(None)
+
+    stats["updates"] += 1
+    queries_per_update.observe(update.count)
+
+    if update.count > Config["db_query_budget"]:
+        stats["over_budget"] += 1
+        repeated = [
+            f"{count}x {_summary(statement, 80)}"
+            for statement, count in update.statements.most_common(3) if count > 1
+        ]
+        logger.warning(
+            "Update %s %s of user %s ran %d queries (budget %d) in %.3fs%s",
+            update.update_type, update.event_id, update.user_id, update.count,
+            Config["db_query_budget"], update.time,
+            "; repeated: " + "; ".join(repeated) if repeated else ""
+        )
+
+    return update
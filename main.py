@@ -2,7 +2,7 @@
 GroupManagerBot - Main Entry Point
 
 This module serves as the main entry point for the GroupManagerBot application. It initializes
-the bot, sets up the database tables, and starts the bot's polling mechanism.
+the bot, sets up the database tables, and starts receiving updates by polling or webhook.
 
 The bot is designed to manage Telegram group memberships with features including:
 - Subscription management
@@ -20,9 +20,11 @@ Dependencies:
 
 import asyncio
 from config import Config
-from database.main import create_tables
+from database.main import create_tables, migrate_subscription_data
 from utils.logger import get_logger
 from bot.instance import StartBot
+from classes.CoinPayments import coinpayments
+from classes.ShardLeases import shard_leases
 
 logger = get_logger(__name__)
 
@@ -32,20 +34,34 @@ async def main() -> None:
     
     This function:
     1. Creates necessary database tables
-    2. Initializes the bot instance
-    3. Starts the bot's polling mechanism
-    4. Handles any critical errors during operation
+    2. Migrates legacy subscription data
+    3. Opens the CoinPayments client
+    4. Initializes the bot instance
+    5. Starts receiving updates (polling, or webhook served with the API app)
+    6. Handles any critical errors during operation
+    7. Closes the CoinPayments client and releases the members checker leases on shutdown
     
     Raises:
         Exception: If any critical error occurs during bot initialization or operation
     """
     try:
         await create_tables()
+        migrated = await migrate_subscription_data()
+        if migrated:
+            logger.info("Migrated %d subscriptions to the subscriptions table.", migrated)
+        await coinpayments.start()
         logger.info("Bot running.")
         await StartBot()
     except Exception as e:
         logger.error("Critical error in the bot: %s", e, exc_info=True)
         raise
+    finally:
+        await coinpayments.close()
+        try:
+            # Let another process take over the members checker right away
+            await shard_leases.release()
+        except Exception as e:
+            logger.error("Could not release the members checker leases: %s", e)
 
 if __name__ == '__main__':
     asyncio.run(main())
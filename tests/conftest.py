@@ -0,0 +1,34 @@
+"""
+Test Configuration
+
+Points the bot's config at a temporary SQLite database before any of the bot's
+modules are imported, and creates the tables once per session.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_database = os.path.join(tempfile.mkdtemp(prefix="groupmanager-tests-"), "tests.sqlite")
+os.environ["GROUPMANAGER_CONFIG"] = json.dumps({
+    "BOT_TOKEN": "123456:test",
+    "GROUP_CHAT_ID": -1000000000001,
+    "DB_CONNECTION_STRING": f"sqlite+aiosqlite:///{_database}",
+    "log_file": "",
+})
+
+import pytest
+
+@pytest.fixture(scope="session")
+def loop():
+    """Event loop shared by the tests, the database engine's connections belong to it."""
+    from database.main import create_tables
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(create_tables())
+    yield loop
+    loop.close()
@@ -0,0 +1,26 @@
+"""Tests of the queued logging in utils.logger."""
+
+import json
+import logging
+
+from utils import logger as log
+
+def test_json_records_keep_the_exception_and_context(tmp_path):
+    path = tmp_path / "bot.log"
+    log.configure_logging(file=str(path), json_format=True)
+    try:
+        log.set_log_context(update_type="message", event_id=42, user_id=7)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("tests").error("Failed with %s", "args", exc_info=True)
+        log._listener.stop()
+        log._listener = None
+    finally:
+        log.set_log_context()
+        log.configure_logging(file="")
+
+    entry = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    assert entry["message"] == "Failed with args"
+    assert "ValueError: boom" in entry["exception"]
+    assert (entry["event_id"], entry["user_id"]) == (42, 7)
@@ -0,0 +1,34 @@
+"""Tests of the membership mirror in classes.MembershipMirror."""
+
+from classes.MembershipMirror import MembershipMirror
+from database import MySQL
+
+def test_refresh_picks_up_changes_recorded_by_other_processes(loop):
+    async def run():
+        for user_id in (801, 802, 803):
+            await MySQL.EnsureUser(user_id, user_id, f"Mirror {user_id}", f"mirror_{user_id}", "en")
+        await MySQL.UpdateFieldForUser(801, "inGroup", True)
+
+        mirror = MembershipMirror()
+        mirror.states = {801: False, 802: True, 803: False}
+        await mirror.refresh([801, 802, 803])
+        return mirror.get(801), mirror.get(802), mirror.get(803)
+
+    # Joined elsewhere, left elsewhere, and still known to be out of the group
+    assert loop.run_until_complete(run()) == (True, None, False)
+
+def test_recorded_states_are_written_by_flush(loop):
+    async def run():
+        for user_id in (811, 812, 813):
+            await MySQL.EnsureUser(user_id, user_id, f"Mirror {user_id}", f"mirror_{user_id}", "en")
+        await MySQL.UpdateFieldForUser(813, "inGroup", True)
+
+        mirror = MembershipMirror()
+        mirror.record(811, True)
+        mirror.record(812, True)
+        mirror.record(813, False)
+        before = sorted(await MySQL.GetGroupMemberIds([811, 812, 813]))
+        await mirror.flush()
+        return before, sorted(await MySQL.GetGroupMemberIds([811, 812, 813])), mirror.unsaved
+
+    assert loop.run_until_complete(run()) == ([813], [811, 812], {})
@@ -0,0 +1,86 @@
+"""Tests of the payment records in database.MySQL."""
+
+from datetime import timedelta
+
+from database import MySQL
+from utils.utils import utcnow
+
+async def _create_payment(txn_id: str, status: int = 0, user_id: int = 1):
+    now = utcnow()
+    await MySQL.CreatePayment(
+        txn_id, user_id, coin="BTC", amount="0.001", address="addr", qrcode_url=None,
+        status_url=None, deadline=now + timedelta(hours=1), created_at=now, status=status
+    )
+
+async def _status(txn_id: str) -> int:
+    return (await MySQL.GetPaymentByTxnId(txn_id)).status
+
+def test_late_pending_notification_keeps_completed_status(loop):
+    async def run():
+        await _create_payment("late-pending")
+        assert await MySQL.UpdatePaymentStatus("late-pending", 100)
+        assert await MySQL.UpdatePaymentStatus("late-pending", 1)
+        assert await MySQL.UpdatePaymentStatus("late-pending", 0)
+        return await _status("late-pending")
+
+    assert loop.run_until_complete(run()) == 100
+
+def test_pending_status_only_increases(loop):
+    async def run():
+        await _create_payment("pending-order")
+        await MySQL.UpdatePaymentStatus("pending-order", 2)
+        await MySQL.UpdatePaymentStatus("pending-order", 1)
+        return await _status("pending-order")
+
+    assert loop.run_until_complete(run()) == 2
+
+def test_failure_after_pending_is_recorded_and_final(loop):
+    async def run():
+        await _create_payment("cancelled")
+        await MySQL.UpdatePaymentStatus("cancelled", 1)
+        await MySQL.UpdatePaymentStatus("cancelled", -1)
+        await MySQL.UpdatePaymentStatus("cancelled", 100)
+        return await _status("cancelled")
+
+    assert loop.run_until_complete(run()) == -1
+
+def test_unknown_payment(loop):
+    assert not loop.run_until_complete(MySQL.UpdatePaymentStatus("unknown", 100))
+
+def test_failed_notification_is_retried(loop, monkeypatch):
+    from classes.PaymentQueue import payment_queue
+    from classes.User import User
+
+    sent = []
+    failures = [RuntimeError("Telegram is unavailable")]
+
+    async def create_invite_link(user_id):
+        if failures:
+            raise failures.pop()
+        return "https://t.me/+invite"
+
+    async def send_message(self, text, **kwargs):
+        sent.append(self.user_id)
+
+    monkeypatch.setattr(payment_queue.GroupManager, "CreateInviteLink", create_invite_link)
+    monkeypatch.setattr(User, "SendMessage", send_message)
+
+    async def run():
+        await MySQL.EnsureUser(701, 701, "Notified Buyer", "notified_buyer", "en")
+        await _create_payment("notify-retry", status=100, user_id=701)
+
+        try:
+            await payment_queue._apply("notify-retry")
+        except RuntimeError:
+            pass
+        unfinished = await MySQL.GetUnfinishedPayments(utcnow() + timedelta(seconds=1))
+
+        await payment_queue._apply("notify-retry")
+        await payment_queue._apply("notify-retry")
+        payment = await MySQL.GetPaymentByTxnId("notify-retry")
+        return unfinished, payment
+
+    unfinished, payment = loop.run_until_complete(run())
+    assert "notify-retry" in unfinished
+    assert payment.applied_at is not None and payment.notified_at is not None
+    assert sent == [701]
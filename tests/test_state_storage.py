@@ -0,0 +1,157 @@
+"""Tests of the shared conversation state storage in classes.StateStorage."""
+
+import asyncio
+import itertools
+
+import pytest
+
+from classes.StateStorage import (
+    Batcher, LocalRedis, MySQLStateBackend, RedisStateBackend, SharedStateStorage, begin_update
+)
+
+# Chat IDs of the tests, so the records of different tests never share a key in the SQLite database
+_chat_ids = itertools.count(1000)
+
+class CountingBackend:
+    """Wraps a backend and records the keys of every get_many() call."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.reads = []
+
+    async def get_many(self, keys: list) -> dict:
+        self.reads.append(sorted(keys))
+        return await self.backend.get_many(keys)
+
+    async def set_many(self, records: dict, ttl: float) -> None:
+        await self.backend.set_many(records, ttl)
+
+    async def purge(self) -> int:
+        return await self.backend.purge()
+
+@pytest.fixture(params=["redis", "mysql"])
+def make_storage(request):
+    """Build storages on a RedisStateBackend(LocalRedis()) or on the MySQLStateBackend (SQLite)."""
+    def make(ttl: float = 60) -> SharedStateStorage:
+        if request.param == "redis":
+            backend = RedisStateBackend(LocalRedis())
+        else:
+            backend = MySQLStateBackend()
+        return SharedStateStorage(CountingBackend(backend), ttl)
+
+    return make
+
+def test_batcher_coalesces_and_keeps_the_last_value(loop):
+    flushes = []
+
+    async def flush(items):
+        flushes.append(dict(items))
+        return {key: f"{value}!" for key, value in items.items()}
+
+    async def run():
+        batcher = Batcher(flush)
+        return await asyncio.gather(batcher.submit("a", 1), batcher.submit("b", 2), batcher.submit("a", 3))
+
+    assert loop.run_until_complete(run()) == ["3!", "2!", "3!"]
+    assert flushes == [{"a": 3, "b": 2}]
+
+def test_batcher_flush_error_reaches_every_waiter(loop):
+    async def flush(items):
+        raise ConnectionError("backend down")
+
+    async def run():
+        batcher = Batcher(flush)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = loop.run_until_complete(run())
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError]
+
+def test_state_and_data_round_trip(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def run():
+        storage = make_storage()
+        await storage.set_state(chat_id, 1, "Buy:coin")
+        await storage.set_data(chat_id, 1, "coin", "BTC")
+        async with storage.get_interactive_data(chat_id, 1) as data:
+            data["amount"] = 2
+        state, data = await storage.get_state(chat_id, 1), await storage.get_data(chat_id, 1)
+
+        deleted = await storage.delete_state(chat_id, 1)
+        return state, data, deleted, await storage.get_state(chat_id, 1), await storage.delete_state(chat_id, 1)
+
+    assert loop.run_until_complete(run()) == ("Buy:coin", {"coin": "BTC", "amount": 2}, True, None, False)
+
+def test_set_data_on_a_missing_key_raises(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def run():
+        await make_storage().set_data(chat_id, 1, "coin", "BTC")
+
+    with pytest.raises(RuntimeError):
+        loop.run_until_complete(run())
+
+def test_concurrent_reads_are_one_backend_call(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def run():
+        storage = make_storage()
+        await asyncio.gather(*[storage.set_state(chat_id, user_id, "s") for user_id in range(5)])
+        storage.backend.reads.clear()
+        states = await asyncio.gather(*[storage.get_state(chat_id, user_id) for user_id in range(5)])
+        return states, storage.backend.reads
+
+    states, reads = loop.run_until_complete(run())
+    assert states == ["s"] * 5
+    assert len(reads) == 1 and len(reads[0]) == 5
+
+def test_update_memo_reads_a_record_once(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def update(storage):
+        begin_update()
+        states = [await storage.get_state(chat_id, 1) for _ in range(3)]
+        await storage.set_state(chat_id, 1, "second")
+        states.append(await storage.get_state(chat_id, 1))
+        return states
+
+    async def run():
+        storage = make_storage()
+        await storage.set_state(chat_id, 1, "first")
+        storage.backend.reads.clear()
+        states = await asyncio.create_task(update(storage))
+        return states, len(storage.backend.reads)
+
+    assert loop.run_until_complete(run()) == (["first", "first", "first", "second"], 1)
+
+def test_records_expire_after_the_ttl(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def run():
+        storage = make_storage(ttl=0.05)
+        await storage.set_state(chat_id, 1, "s")
+        fresh = await storage.get_state(chat_id, 1)
+        await asyncio.sleep(0.1)
+        expired = await storage.get_state(chat_id, 1)
+        # Redis expires the keys itself, the bot_states rows stay until purged
+        purged = await storage.backend.purge()
+        return fresh, expired, purged, isinstance(storage.backend.backend, MySQLStateBackend)
+
+    fresh, expired, purged, mysql = loop.run_until_complete(run())
+    assert (fresh, expired) == ("s", None)
+    assert purged >= 1 if mysql else purged == 0
+
+def test_deleted_records_are_removed_from_the_backend(loop, make_storage):
+    chat_id = next(_chat_ids)
+
+    async def run():
+        storage = make_storage()
+        await storage.set_state(chat_id, 1, "s")
+        await storage.set_state(chat_id, 2, "s")
+        key = storage._key(chat_id, 1)
+        await storage.delete_state(chat_id, 1)
+        return key, await storage.backend.get_many([key, storage._key(chat_id, 2)])
+
+    key, records = loop.run_until_complete(run())
+    assert key not in records
+    assert len(records) == 1
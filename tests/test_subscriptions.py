@@ -0,0 +1,55 @@
+"""Tests of the subscription queries in database.MySQL."""
+
+from datetime import timedelta
+
+from database import MySQL
+from utils.utils import utcnow
+
+def test_expired_subscription_pages_of_owned_shards(loop):
+    async def run():
+        now = utcnow()
+        expires_at = now - timedelta(hours=1)
+        # Equal deadlines make the pages continue on user_id
+        for user_id in range(900, 907):
+            await MySQL.SetSubscription(user_id, expires_at if user_id < 905 else now - timedelta(minutes=user_id - 900))
+        await MySQL.SetSubscription(907, now + timedelta(days=1))
+
+        every = [
+            [subscription.user_id for subscription in page]
+            async for page in MySQL.IterExpiredSubscriptionPages(now, page_size=2)
+        ]
+        even = [
+            subscription.user_id
+            async for page in MySQL.IterExpiredSubscriptionPages(now, shards=2, owned={0}, page_size=2)
+            for subscription in page
+        ]
+        return every, even
+
+    every, even = loop.run_until_complete(run())
+    assert [len(page) for page in every] == [2, 2, 2, 1]
+    assert sorted(sum(every, [])) == list(range(900, 907))
+    assert sorted(even) == [900, 902, 904, 906]
+
+def test_delete_expired_subscriptions_keeps_subscriptions_extended_after_the_page_was_read(loop):
+    async def run():
+        now = utcnow()
+        for user_id in (910, 911):
+            await MySQL.SetSubscription(user_id, now - timedelta(hours=1))
+
+        page = [
+            subscription.user_id
+            async for subscriptions in MySQL.IterExpiredSubscriptionPages(now)
+            for subscription in subscriptions
+            if subscription.user_id in (910, 911)
+        ]
+        # Renewed between reading the page and deleting it
+        await MySQL.SetSubscription(911, now + timedelta(days=30))
+
+        deleted = await MySQL.DeleteExpiredSubscriptions(page, now)
+        return page, deleted, await MySQL.GetSubscription(910), await MySQL.GetSubscription(911)
+
+    page, deleted, expired, renewed = loop.run_until_complete(run())
+    assert sorted(page) == [910, 911]
+    assert deleted == [910]
+    assert expired is None
+    assert renewed is not None and renewed.expires_at > utcnow()
@@ -0,0 +1,46 @@
+"""Tests of the user creation in database.MySQL and utils.user."""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from database import MySQL
+from utils.user import check_user, known_users
+
+def _message(user_id: int, username: str):
+    return SimpleNamespace(from_user=SimpleNamespace(
+        id=user_id, first_name="First", last_name=str(user_id), username=username, language_code="en"
+    ))
+
+def test_ensure_user_is_idempotent(loop):
+    async def run():
+        first = await MySQL.EnsureUser(501, 501, "Idem Potent", "idempotent", "en")
+        second = await MySQL.EnsureUser(501, 501, "Idem Potent", "idempotent", "en")
+        return first, second
+
+    assert loop.run_until_complete(run()) == (True, True)
+
+def test_taken_username_is_not_marked_known(loop):
+    async def run():
+        await check_user(_message(601, "taken"))
+        await check_user(_message(602, "taken"))
+        return await MySQL.GetUserById(602)
+
+    assert loop.run_until_complete(run()) is None
+    assert 601 in known_users
+    assert 602 not in known_users
+
+def test_claim_email(loop):
+    async def run():
+        await MySQL.EnsureUser(701, 701, "Claim First", "claim_first", "en")
+        await MySQL.EnsureUser(702, 702, "Claim Second", "claim_second", "en")
+        linked = await MySQL.ClaimEmail(701, "claimed@example.com")
+        # No record for the user, nothing is stored
+        missing = await MySQL.ClaimEmail(703, "missing@example.com")
+        return linked, missing, (await MySQL.GetUserById(701)).email
+
+    assert loop.run_until_complete(run()) == (True, False, "claimed@example.com")
+
+    with pytest.raises(IntegrityError):
+        loop.run_until_complete(MySQL.ClaimEmail(702, "claimed@example.com"))
@@ -0,0 +1,149 @@
+"""
+Cache Module
+
+This module provides the in-process caches used by the bot including:
+- A size-bounded LRU cache with a time-to-live per entry
+- Single-flight loading, so concurrent misses for a key share one load
+- Invalidation that keeps the stale value around for the next load
+
+The shared user cache is defined here so the database layer can invalidate
+entries without importing the User class.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from config import Config
+
+class LRUCache:
+    """
+    A size-bounded LRU cache whose entries expire after a time-to-live.
+
+    Attributes:
+        maxsize (int): Maximum number of entries, the least recently used one is evicted first
+        ttl (float): Number of seconds an entry stays fresh
+        entries (OrderedDict): Cached (value, expires_at) tuples, least recently used first
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of entries
+            ttl (float): Number of seconds an entry stays fresh
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self._loading = {}
+        self._invalidated_loads = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key) -> Any:
+        """
+        Get a fresh value from the cache.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            Any: The cached value, None if it is missing or expired
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key) -> Any:
+        """
+        Get a cached value even if it expired, without touching the LRU order.
+
+        Args:
+            key: The cache key
+
+        Returns:
+            Any: The cached value, None if it is missing
+        """
+        entry = self.entries.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value) -> None:
+        """
+        Store a value in the cache, evicting the least recently used entries if full.
+
+        Args:
+            key: The cache key
+            value: The value to store
+        """
+        self.entries[key] = (value, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        """
+        Mark an entry as expired. The stale value is passed to the next loader.
+
+        Args:
+            key: The cache key
+        """
+        entry = self.entries.get(key)
+        if entry:
+            self.entries[key] = (entry[0], 0.0)
+
+        # A load in progress may have read the data before this change
+        if key in self._loading:
+            self._invalidated_loads.add(key)
+
+    async def get_or_load(self, key, loader: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Get a fresh value from the cache, loading it on a miss.
+
+        Concurrent misses for the same key wait for a single call to the loader.
+
+        Args:
+            key: The cache key
+            loader: Coroutine function called with the stale value (or None) that
+                returns the new value
+
+        Returns:
+            Any: The cached or freshly loaded value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        if key in self._loading:
+            return await asyncio.shield(self._loading[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader(self.peek(key))
+            self.set(key, value)
+            if key in self._invalidated_loads:
+                self.invalidate(key)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Don't warn about the exception if nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+            self._invalidated_loads.discard(key)
+
+# Shared cache of classes.User instances, keyed by Telegram user ID
+user_cache = LRUCache(maxsize=Config["user_cache_size"], ttl=Config["user_cache_ttl"])
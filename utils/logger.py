@@ -7,21 +7,201 @@ It configures logging to both file and console output, enabling:
 - Operation monitoring
 - System status logging
 
-The logger is configured to provide detailed information about
-bot operations and any issues that arise during execution.
+The log records are put on a queue and written by a background thread
+(QueueHandler/QueueListener), so a slow disk never blocks the event loop.
+The log file is rotated by size or by time, the records can be written as
+JSON lines carrying the message or callback query and user IDs, and very
+frequent messages are sampled. configure_logging() is called by config.py
+with the settings from the config.
 """
 
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 
-# Configure basic logging settings
-logging.basicConfig(
-    level=logging.INFO,  # Set logging level to INFO
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("bot.log"),  # Log to file
-        logging.StreamHandler()  # Log to console
-    ]
-)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Update and user of the update being processed, see set_log_context()
+_log_context = contextvars.ContextVar("log_context", default=None)
+
+# The listener writing the queued records, set by configure_logging()
+_listener = None
+
+def set_log_context(**fields) -> None:
+    """
+    Attach fields (e.g. event_id, user_id) to the records logged while processing the current update.
+
+    Args:
+        **fields: The fields, added to the JSON records
+    """
+    _log_context.set(fields)
+
+class ContextFilter(logging.Filter):
+    """Copies the log context onto the records, in the logging thread where the contextvar is set."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        if context:
+            for key, value in context.items():
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through at most burst records of each message per interval, below WARNING.
+
+    The number of dropped records is appended to the next record let through.
+
+    Attributes:
+        burst (int): Number of records of a message let through per interval
+        interval (float): Length of an interval, in seconds
+    """
+
+    def __init__(self, burst: int, interval: float):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            started, count, dropped = self.windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+
+            if count >= self.burst:
+                self.windows[key] = (started, count, dropped + 1)
+                return False
+
+            self.windows[key] = (started, count + 1, 0)
+            if len(self.windows) > 10000:
+                self.windows.clear()
+
+        if dropped:
+            record.msg = f"{record.msg} [{dropped} similar messages dropped]"
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that drops the records when the queue is full, instead of blocking.
+
+    Attributes:
+        dropped (int): Number of records dropped because the queue was full
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() merges the traceback into the message and clears exc_info,
+        # keep it for the formatters of the listener (e.g. the JSON "exception" field)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JSONFormatter(logging.Formatter):
+    """Formats the records as JSON lines, with the fields of the log context."""
+
+    FIELDS = ("update_type", "event_id", "user_id")
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def configure_logging(level: str = "INFO", file: str = "bot.log", json_format: bool = False,
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, rotate_when: str = "",
+                      sample_burst: int = 0, sample_interval: float = 60, queue_size: int = 10000) -> None:
+    """
+    Configure the root logger to write through a queue to the log file and the console.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level (str, optional): Minimum level of the records. Defaults to "INFO"
+        file (str, optional): Path of the log file, empty to log to the console only. Defaults to "bot.log"
+        json_format (bool, optional): Whether to write JSON lines instead of text. Defaults to False
+        max_bytes (int, optional): Size at which the log file is rotated, 0 to disable. Defaults to 10 MiB
+        backup_count (int, optional): Number of rotated files kept. Defaults to 5
+        rotate_when (str, optional): Rotate by time instead of size, e.g. "midnight" or "H"
+            (see TimedRotatingFileHandler). Defaults to size rotation
+        sample_burst (int, optional): Number of records of a message logged per sample_interval below
+            WARNING, 0 to log them all. Defaults to 0
+        sample_interval (float, optional): Length of a sampling interval, in seconds. Defaults to 60
+        queue_size (int, optional): Number of records the queue holds, records are dropped when it is full.
+            Defaults to 10000
+    """
+    global _listener
+
+    formatter = JSONFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if file:
+        if rotate_when:
+            handlers.append(logging.handlers.TimedRotatingFileHandler(
+                file, when=rotate_when, backupCount=backup_count, encoding="utf-8"
+            ))
+        else:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    if sample_burst:
+        queue_handler.addFilter(SamplingFilter(sample_burst, sample_interval))
+
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+@atexit.register
+def _stop_listener() -> None:
+    """Write the queued records before the process exits."""
+    if _listener is not None:
+        _listener.stop()
 
 def get_logger(name: str) -> logging.Logger:
     """
@@ -37,7 +217,7 @@ def get_logger(name: str) -> logging.Logger:
 
     Returns:
         logging.Logger: Configured logger instance
-    
+
     Example:
         >>> logger = get_logger(__name__)
         >>> logger.info("Bot started")
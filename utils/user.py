@@ -2,8 +2,9 @@
 User Utility Module
 
 This module provides utility functions for user management including:
-- User instance caching
+- User instance caching (bounded LRU with TTL)
 - User creation and initialization
+- Tracking of users already known to exist in the database
 - Admin privilege verification
 - User data management
 
@@ -12,20 +13,26 @@ and maintains a cache of user instances for improved performance.
 """
 
 from classes.User import User
-from classes.GroupManager import GroupManager as GM
+from classes.AdminCache import admin_cache
 from database import MySQL
 from config import Config
+from utils.cache import user_cache
+from utils.logger import get_logger
 
-# Cache for storing user instances
-users = {}
+logger = get_logger(__name__)
+
+# IDs of users known to exist in the database, so check_user skips the query for them
+known_users = set()
 
 async def GetUser(user_id):
     """
     Get or create a User instance for the specified user ID.
 
-    This function implements a caching mechanism to avoid recreating
-    User instances unnecessarily. If the user exists in cache, it
-    updates their data and returns the cached instance.
+    User instances are kept in a size-bounded LRU cache. A cached instance is
+    returned without touching the database until its TTL expires or a database
+    write invalidates it; its data is then reloaded into the same instance, so
+    state like the last sent message is kept. Concurrent calls for the same user
+    share a single load.
 
     Args:
         user_id: Telegram user ID
@@ -33,44 +40,52 @@ async def GetUser(user_id):
     Returns:
         User: Instance of User class for the specified ID
     """
-    if user_id not in users:
-        newUser = User(user_id)
-        await newUser.init_asyncs()
-        users[user_id] = newUser
+    async def load(user):
+        if user is None:
+            user = User(user_id)
+            await user.init_asyncs()
+        else:
+            await user.load_data()
+        return user
 
-    user = users[user_id]
-    await user.load_data()
-    return user
+    return await user_cache.get_or_load(int(user_id), load)
 
 async def check_user(message):
     """
     Verify and initialize user data if needed.
 
-    This function checks if a user exists in the database and creates
-    a new user record if they don't. It's typically called when a user
-    first interacts with the bot.
+    This function makes sure a user exists in the database, creating the
+    record with a single atomic insert if they don't. It's called for every
+    update, so users already seen by this process are skipped without a query.
+    Users whose record couldn't be created are checked again on their next update.
 
     Args:
         message: Telegram message object containing user information
     """
     user_id = message.from_user.id 
-    user_data = await MySQL.GetUserById(user_id)
-
-    if not user_data:
-        await MySQL.CreateUser(
-            chat_id=user_id,
-            user_id=user_id,
-            fullname=f"{message.from_user.first_name} {message.from_user.last_name}",
-            username=message.from_user.username,
-            lang=message.from_user.language_code or Config["DEFAULT_LANGUAGE"],
-        )
+    if user_id in known_users:
+        return
+
+    exists = await MySQL.EnsureUser(
+        chat_id=user_id,
+        user_id=user_id,
+        fullname=f"{message.from_user.first_name} {message.from_user.last_name}",
+        username=message.from_user.username,
+        lang=message.from_user.language_code or Config["DEFAULT_LANGUAGE"],
+    )
+    if not exists:
+        # Another user already has the same full name or username
+        logger.warning("Could not create user %s, their name or username is already taken.", user_id)
+        return
+
+    known_users.add(user_id)
 
 async def is_admin(user_id: int | str) -> bool: 
     """
     Check if a user has admin privileges.
 
     This function verifies whether a user is an administrator in the
-    configured Telegram group.
+    configured Telegram group, using the shared admin cache.
 
     Args:
         user_id (int | str): Telegram user ID to check
@@ -78,7 +93,4 @@ async def is_admin(user_id: int | str) -> bool:
     Returns:
         bool: True if user is an admin, False otherwise
     """
-    GroupManager = GM()
-    admins = await GroupManager.GetAdmins()
-    isAdmin = next((True for admin in admins if user_id == admin.user.id), False)
-    return isAdmin
+    return await admin_cache.is_admin(user_id)
@@ -3,19 +3,16 @@ Utility Functions Module
 
 This module provides various utility functions used throughout the bot including:
 - Cryptographic operations (HMAC signatures)
-- Payment transaction handling
 - Email validation
 - General helper functions
 
 The utilities in this module support core bot functionality and external integrations.
 """
 
-import aiohttp
 import re
 import hmac
 import hashlib
-import urllib.parse
-from typing import Any
+from datetime import datetime, timezone
 
 from config import Config
 
@@ -38,48 +35,32 @@ def generate_hmac_signature(raw_data) -> str:
     ).hexdigest()
     return signature
 
-async def create_transaction(buyer_name: str, buyer_email: str, currency: str) -> str:
+def utcnow() -> datetime:
     """
-    Create a new payment transaction.
+    Get the current time as a naive UTC datetime.
 
-    This function interfaces with the payment provider's API to create
-    a new transaction for subscription payment.
+    This is the format used by the DateTime columns of the database.
+
+    Returns:
+        datetime: The current UTC time without tzinfo
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def get_retry_after(exception: Exception) -> int | None:
+    """
+    Get the number of seconds Telegram asked us to wait before retrying.
 
     Args:
-        buyer_name (str): Name of the buyer
-        buyer_email (str): Email of the buyer
-        currency (str): Currency code for the transaction
+        exception (Exception): The exception raised by a Bot API call
 
     Returns:
-        str: Transaction details if successful, None if failed
+        int | None: The retry_after value of a 429 error, None for any other exception
     """
-    params: dict = {}
-    params['version'] = "1"
-    params['key'] = Config["PUBLIC_KEY"]
-    params['cmd'] = "create_transaction"
-    params['amount'] = Config["subscription_price"]
-    params['currency1'] = "USD"
-    params['currency2'] = currency
-    params['buyer_name'] = buyer_name
-    params['buyer_email'] = buyer_email
-
-    encoded_params: str = urllib.parse.urlencode(params)
-    hmac_sign: str = generate_hmac_signature(encoded_params)
-
-    headers: dict = {
-        'HMAC': hmac_sign,
-        'Content-Type': 'application/x-www-form-urlencoded'
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.post("https://www.coinpayments.net/api.php", headers=headers, data=encoded_params) as response:
-            if response.status == 200:
-                data: Any = await response.json()
-                if data['error'] == 'ok':
-                    result: str = data['result']
-                    return result
-                
-    return None
+    if getattr(exception, "error_code", None) != 429:
+        return None
+
+    result_json = getattr(exception, "result_json", None) or {}
+    return int(result_json.get("parameters", {}).get("retry_after", 1))
 
 def is_email(email: str) -> bool:
     """